@@ -5,9 +5,11 @@ Endpoints: query (streaming), upload, ingest, documents, health.
 import os
 import json
 import shutil
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -17,9 +19,7 @@ from backend.utils.logger import logger
 from backend.utils.datatypes import ChunkingStrategy
 
 # Pipeline imports
-from backend.ingestion.pdf_loader import PDFLoader
-from backend.preprocessing.preprocessor import TextPreprocessor
-from backend.preprocessing.structure_detector import StructureDetector
+from backend.ingestion.pipeline import IngestionPipeline
 from backend.chunking.chunking_manager import ChunkingManager
 from backend.embeddings.embeddings import EmbeddingEngine
 from backend.vectorstore.chroma_store import ChromaStore
@@ -27,15 +27,29 @@ from backend.retrieval.dense_retriever import DenseRetriever
 from backend.retrieval.bm25_retriever import BM25Retriever
 from backend.retrieval.hybrid_retriever import HybridRetriever
 from backend.retrieval.query_expander import QueryExpander
+from backend.utils.ollama_client import OllamaClient
+from backend.rag.answer_cache import AnswerCache
 from backend.rag.llm_client import LLMClient
+from backend.rag.parent_context import ParentContextAssembler
 from backend.rag.rag_agent import RAGAgent
 from backend.evaluation.evaluator import RAGEvaluator
 
 # --- App ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model and the BM25 index before serving, not on the first query
+    hybrid_retriever.warm_up()
+    yield
+    bm25_retriever.save_if_dirty()
+    ollama_client.close()
+    await ollama_client.aclose()
+
+
 app = FastAPI(
     title="Document Intelligence System",
     description="Production-grade RAG system with PDF ingestion, hybrid retrieval, and Phi-3 Mini",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -47,18 +61,27 @@ app.add_middleware(
 )
 
 # --- Singleton Components ---
-pdf_loader = PDFLoader()
-preprocessor = TextPreprocessor()
-structure_detector = StructureDetector()
 embedding_engine = EmbeddingEngine()
 chroma_store = ChromaStore()
 chunking_manager = ChunkingManager(embedding_model=embedding_engine.model)
 dense_retriever = DenseRetriever(chroma_store, embedding_engine)
 bm25_retriever = BM25Retriever(chroma_store)
+ingestion_pipeline = IngestionPipeline(
+    embedding_engine, chroma_store, chunking_manager, bm25_retriever=bm25_retriever
+)
 hybrid_retriever = HybridRetriever(dense_retriever, bm25_retriever)
-query_expander = QueryExpander(hybrid_retriever)
-llm_client = LLMClient()
-rag_agent = RAGAgent(hybrid_retriever, query_expander, llm_client)
+ollama_client = OllamaClient()  # one connection pool for generation, HyDE and /health
+query_expander = QueryExpander(hybrid_retriever, ollama_client=ollama_client)
+llm_client = LLMClient(ollama_client=ollama_client)
+parent_assembler = ParentContextAssembler(chroma_store)
+answer_cache = AnswerCache(embedding_engine, chroma_store)
+rag_agent = RAGAgent(
+    hybrid_retriever,
+    query_expander,
+    llm_client,
+    parent_assembler=parent_assembler,
+    answer_cache=answer_cache,
+)
 evaluator = RAGEvaluator()
 
 logger.info("All components initialized successfully")
@@ -76,11 +99,14 @@ class QueryResponse(BaseModel):
     model: str
     retrieval_method: str
     confidence_score: float = 0.0
+    context_tokens: int = 0  # estimated tokens of retrieved context sent to the LLM
+    cached: bool = False
 
 
 class IngestRequest(BaseModel):
     directory: Optional[str] = None
     chunking_strategy: str = "recursive"
+    full_rebuild: bool = False  # default: only process added/changed/removed files
 
 
 class DocumentInfo(BaseModel):
@@ -95,12 +121,16 @@ async def health_check():
     """System health check."""
     try:
         doc_count = chroma_store.count()
-        model_info = llm_client.get_model_info()
+        model_info = await llm_client.aget_model_info()
         return {
             "status": "healthy",
             "documents_indexed": doc_count,
             "model": model_info,
             "embedding_model": CONFIG.embedding.model_name,
+            "query_embedding_cache": embedding_engine.cache_stats(),
+            "answer_cache": answer_cache.stats(),
+            "retrieval_cache": hybrid_retriever.cache_stats(),
+            "retrieval_quality": rag_agent.quality_estimator.stats(),
             "vector_store": "ChromaDB",
             "chunking_strategies": ChunkingManager.available_strategies(),
         }
@@ -115,7 +145,7 @@ async def query_endpoint(req: QueryRequest):
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
 
     try:
-        result = rag_agent.query(req.question)
+        result = await rag_agent.aquery(req.question)
         citations = result.get("citations", [])
         avg_sim = sum(c["score"] for c in citations) / len(citations) if citations else 0.0
         normalized_confidence = min(1.0, avg_sim * 30)
@@ -127,6 +157,8 @@ async def query_endpoint(req: QueryRequest):
             model=CONFIG.ollama.model,
             retrieval_method=result.get("retrieval_method", "hybrid"),
             confidence_score=confidence,
+            context_tokens=result.get("context_tokens", 0),
+            cached=result.get("cached", False),
         )
     except Exception as e:
         logger.error(f"Query failed: {e}")
@@ -140,7 +172,7 @@ async def query_stream_endpoint(req: QueryRequest):
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
 
     try:
-        citations, stream_or_error = rag_agent.query_stream(req.question)
+        citations, stream_or_error, context_tokens = await rag_agent.aquery_stream(req.question)
 
         if isinstance(stream_or_error, str):
             # Safety refusal
@@ -158,9 +190,10 @@ async def query_stream_endpoint(req: QueryRequest):
             avg_sim = sum(c["score"] for c in citations) / len(citations) if citations else 0.0
             normalized = min(1.0, avg_sim * 30)
             yield f"data: {json.dumps({'type': 'confidence', 'data': round(normalized * 100, 1)})}\n\n"
+            yield f"data: {json.dumps({'type': 'context_tokens', 'data': context_tokens})}\n\n"
             
             # Stream tokens
-            for token in stream_or_error:
+            async for token in stream_or_error:
                 yield f"data: {json.dumps({'type': 'token', 'data': token})}\n\n"
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
 
@@ -184,23 +217,15 @@ async def upload_document(file: UploadFile = File(...)):
         with open(file_path, "wb") as f:
             shutil.copyfileobj(file.file, f)
 
-        # Auto-ingest the uploaded file
-        pages = pdf_loader.load(file_path)
-        pages = preprocessor.process(pages)
-        sections = structure_detector.detect_sections(pages)
-        chunks = chunking_manager.chunk_sections(
-            sections, document_name=file.filename
-        )
-
-        if chunks:
-            embeddings = embedding_engine.embed_texts([c.text for c in chunks])
-            chroma_store.add_documents(chunks, embeddings)
-            bm25_retriever.build_index()  # Rebuild BM25 index
+        # Auto-ingest the uploaded file (replacing the chunks of an earlier version),
+        # off the event loop so queries are still served meanwhile
+        stats = await run_in_threadpool(ingestion_pipeline.sync_files, [file_path])
 
         return {
             "message": f"Uploaded and ingested {file.filename}",
-            "pages": len(pages),
-            "chunks": len(chunks),
+            "pages": stats.pages,
+            "chunks": stats.chunks,
+            "unchanged": stats.unchanged > 0,
             "file_path": file_path,
         }
 
@@ -226,53 +251,24 @@ async def ingest_documents(req: IngestRequest):
         )
 
     try:
-        # Clear existing data
-        chroma_store.delete_collection()
-
-        pages = pdf_loader.load_directory(doc_dir)
-        pages = preprocessor.process(pages)
-        sections = structure_detector.detect_sections(pages)
-
-        all_chunks = []
-        # Group sections by document for proper naming
-        doc_sections = {}
-        for section in sections:
-            doc_name = section.title  # Will be overridden by page metadata
-            doc_sections.setdefault("all", []).append(section)
-
-        # Process pages to get document names
-        page_doc_map = {}
-        for page in pages:
-            doc_name = page.metadata.get("document_name", "unknown")
-            if doc_name not in page_doc_map:
-                page_doc_map[doc_name] = []
-
-        # Chunk all sections
-        chunks = chunking_manager.chunk_sections(
-            sections, document_name="drug_knowledge_base", strategy=strategy
-        )
-
-        # Re-attribute document names from page metadata
-        for chunk in chunks:
-            if "document_name" not in chunk.metadata or chunk.metadata["document_name"] == "drug_knowledge_base":
-                # Try to find from sections
-                for page in pages:
-                    page_doc_name = page.metadata.get("document_name", "")
-                    if page_doc_name and chunk.text[:50] in page.text:
-                        chunk.metadata["document_name"] = page_doc_name
-                        break
-
-        if chunks:
-            embeddings = embedding_engine.embed_texts([c.text for c in chunks])
-            chroma_store.add_documents(chunks, embeddings)
-            bm25_retriever.build_index()
+        # Ingestion is blocking; keep it off the event loop so queries are still served
+        if req.full_rebuild:
+            stats = await run_in_threadpool(ingestion_pipeline.rebuild, doc_dir, strategy)
+        else:
+            stats = await run_in_threadpool(ingestion_pipeline.sync_directory, doc_dir, strategy)
+        await run_in_threadpool(bm25_retriever.save_index)
 
         return {
             "message": "Ingestion complete",
-            "documents_processed": len(page_doc_map),
-            "pages_loaded": len(pages),
-            "sections_detected": len(sections),
-            "chunks_created": len(chunks),
+            "documents_processed": stats.documents,
+            "documents_failed": stats.failed,
+            "pages_loaded": stats.pages,
+            "sections_detected": stats.sections,
+            "chunks_created": stats.chunks,
+            "files_added": stats.added,
+            "files_changed": stats.changed,
+            "files_removed": stats.removed,
+            "files_unchanged": stats.unchanged,
             "chunking_strategy": strategy.value,
             "vector_store_count": chroma_store.count(),
         }
@@ -305,7 +301,7 @@ async def list_documents():
 async def model_info():
     """Get model and system configuration."""
     return {
-        "llm": llm_client.get_model_info(),
+        "llm": await llm_client.aget_model_info(),
         "embedding": {
             "model": CONFIG.embedding.model_name,
             "dimension": CONFIG.embedding.dimension,
@@ -319,6 +315,11 @@ async def model_info():
             "top_k": CONFIG.retrieval.top_k,
             "hyde_enabled": CONFIG.retrieval.hyde_enabled,
             "rrf_k": CONFIG.retrieval.rrf_k,
+            "fusion_method": CONFIG.retrieval.fusion_method,
+            "weights": {
+                "dense": CONFIG.retrieval.dense_weight,
+                "bm25": CONFIG.retrieval.bm25_weight,
+            },
         },
         "vector_store": {
             "type": "ChromaDB",
@@ -1,7 +1,7 @@
 """
 Chunking Manager — unified interface to select and run any chunking strategy.
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from sentence_transformers import SentenceTransformer
 
@@ -43,14 +43,30 @@ class ChunkingManager:
         document_name: str = "",
         strategy: ChunkingStrategy = None,
     ) -> List[DocumentChunk]:
-        """Chunk sections using the specified or default strategy."""
+        """
+        Chunk sections using the specified or default strategy. Sections are
+        chunked one source document at a time; `document_name` overrides the
+        names recorded on the sections.
+        """
         strategy = strategy or ChunkingStrategy(CONFIG.chunking.default_strategy)
         chunker = self.get_chunker(strategy)
         logger.info(f"Chunking {len(sections)} sections with strategy: {strategy.value}")
-        chunks = chunker.chunk(sections, document_name)
+        chunks = []
+        for name, doc_sections in self.group_by_document(sections, document_name).items():
+            chunks.extend(chunker.chunk(doc_sections, name))
         logger.info(f"Generated {len(chunks)} chunks")
         return chunks
 
+    @staticmethod
+    def group_by_document(
+        sections: List[DocumentSection], document_name: str = ""
+    ) -> Dict[str, List[DocumentSection]]:
+        """Group sections by source document, preserving order."""
+        groups: Dict[str, List[DocumentSection]] = {}
+        for section in sections:
+            groups.setdefault(document_name or section.document_name, []).append(section)
+        return groups
+
     @staticmethod
     def available_strategies() -> List[str]:
         """Return list of available chunking strategy names."""
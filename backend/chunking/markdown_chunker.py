@@ -6,6 +6,7 @@ from typing import List
 from langchain_text_splitters import MarkdownHeaderTextSplitter as LCMarkdownSplitter
 
 from backend.utils.datatypes import DocumentChunk, DocumentSection
+from backend.chunking.provenance import SpanLocator, section_metadata
 
 
 class MarkdownChunker:
@@ -38,9 +39,9 @@ class MarkdownChunker:
                     DocumentChunk(
                         text=section.content,
                         metadata={
-                            "document_name": document_name,
-                            "page_number": section.page_number,
-                            "section_title": section.title,
+                            **section_metadata(section, document_name),
+                            "start_char": section.start_char,
+                            "end_char": section.end_char,
                             "chunk_index": 0,
                             "chunking_strategy": "markdown",
                         },
@@ -48,6 +49,7 @@ class MarkdownChunker:
                 )
                 continue
 
+            locator = SpanLocator(section)
             for i, doc in enumerate(split_docs):
                 header_title = ""
                 if hasattr(doc, "metadata"):
@@ -58,8 +60,7 @@ class MarkdownChunker:
                     DocumentChunk(
                         text=text,
                         metadata={
-                            "document_name": document_name,
-                            "page_number": section.page_number,
+                            **locator.metadata(text, document_name),
                             "section_title": header_title or section.title,
                             "chunk_index": i,
                             "chunking_strategy": "markdown",
@@ -9,6 +9,7 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from backend.utils.datatypes import DocumentChunk, DocumentSection
 from backend.utils.config import CONFIG
+from backend.chunking.provenance import SpanLocator
 
 
 class ParentChildChunker:
@@ -47,6 +48,8 @@ class ParentChildChunker:
 
             text = f"{section.title}\n\n{section.content}" if section.title else section.content
             parent_texts = self.parent_splitter.split_text(text)
+            parent_locator = SpanLocator(section)
+            child_locator = SpanLocator(section)
 
             for p_idx, parent_text in enumerate(parent_texts):
                 parent_id = str(uuid.uuid4())
@@ -56,9 +59,7 @@ class ParentChildChunker:
                     id=parent_id,
                     text=parent_text,
                     metadata={
-                        "document_name": document_name,
-                        "page_number": section.page_number,
-                        "section_title": section.title,
+                        **parent_locator.metadata(parent_text, document_name),
                         "chunk_index": p_idx,
                         "chunking_strategy": "parent_child",
                         "is_parent": True,
@@ -74,9 +75,7 @@ class ParentChildChunker:
                         text=child_text,
                         parent_id=parent_id,
                         metadata={
-                            "document_name": document_name,
-                            "page_number": section.page_number,
-                            "section_title": section.title,
+                            **child_locator.metadata(child_text, document_name),
                             "chunk_index": c_idx,
                             "chunking_strategy": "parent_child",
                             "is_parent": False,
@@ -0,0 +1,51 @@
+"""
+Chunk Provenance — maps chunk text back to its source document, page and
+character span, so chunks never need to be re-attributed after the fact.
+"""
+from typing import Any, Dict, Tuple
+
+from backend.utils.datatypes import DocumentSection
+
+
+def section_metadata(section: DocumentSection, document_name: str = "") -> Dict[str, Any]:
+    """Base chunk metadata for a section: document, page and section title."""
+    return {
+        "document_name": document_name or section.document_name,
+        "page_number": section.page_number,
+        "section_title": section.title,
+    }
+
+
+class SpanLocator:
+    """
+    Resolve chunk texts to page-level character offsets within one section.
+
+    Chunks are located in order with a forward-moving cursor, so a section is
+    scanned roughly once. Text that cannot be found verbatim (e.g. whitespace
+    rewritten by a splitter) falls back to the whole section span.
+    """
+
+    def __init__(self, section: DocumentSection):
+        self.section = section
+        self.prefix = f"{section.title}\n\n" if section.title else ""
+        self._cursor = 0
+
+    def span(self, text: str) -> Tuple[int, int]:
+        content = self.section.content
+        probe = text[len(self.prefix):] if self.prefix and text.startswith(self.prefix) else text
+        probe = probe.strip()
+        if probe == self.section.title.strip():
+            # A chunk holding only the prepended title has no span of its own
+            probe = ""
+        pos = content.find(probe, self._cursor) if probe else -1
+        if pos < 0:
+            return self.section.start_char, self.section.end_char
+        # Overlapping chunks may start before the previous one ends
+        self._cursor = pos + 1
+        start = self.section.start_char + pos
+        return start, start + len(probe)
+
+    def metadata(self, text: str, document_name: str = "") -> Dict[str, Any]:
+        """Section metadata plus the chunk's start_char/end_char."""
+        start, end = self.span(text)
+        return {**section_metadata(self.section, document_name), "start_char": start, "end_char": end}
@@ -1,16 +1,21 @@
 """
 Semantic Chunker — groups sentences by embedding similarity.
 Splits when cosine similarity between consecutive sentences drops below a threshold.
+
+Sentences from all sections are encoded together in large normalized batches,
+adjacent similarities are one row-wise dot product, and each chunk's embedding
+is the re-normalized mean of its sentence embeddings (so chunks need not be
+encoded again at ingest).
 """
 import re
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from backend.utils.datatypes import DocumentChunk, DocumentSection
 from backend.utils.config import CONFIG
-from backend.utils.logger import logger
+from backend.chunking.provenance import SpanLocator, section_metadata
 
 
 class SemanticChunker:
@@ -18,6 +23,7 @@ class SemanticChunker:
 
     def __init__(self, threshold: float = None, model: SentenceTransformer = None):
         self.threshold = threshold or CONFIG.chunking.semantic_threshold
+        self.pooled_embeddings = CONFIG.chunking.semantic_pooled_embeddings
         self._model = model
 
     @property
@@ -31,72 +37,103 @@ class SemanticChunker:
     def chunk(
         self, sections: List[DocumentSection], document_name: str = ""
     ) -> List[DocumentChunk]:
+        sections = [section for section in sections if section.content.strip()]
+        section_sentences = [self._split_sentences(section.content) for section in sections]
+        sentences = [sentence for group in section_sentences for sentence in group]
+        if not sentences:
+            return []
+
+        embeddings = self.model.encode(
+            sentences,
+            batch_size=CONFIG.embedding.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32, copy=False)
+        # Cosine similarity of each sentence with the next (embeddings are unit length)
+        similarities = np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+
         chunks = []
-        for section in sections:
-            if not section.content.strip():
-                continue
-            section_chunks = self._semantic_split(section, document_name)
-            chunks.extend(section_chunks)
+        offset = 0
+        for section, group in zip(sections, section_sentences):
+            count = len(group)
+            chunks.extend(
+                self._semantic_split(
+                    section,
+                    group,
+                    embeddings[offset:offset + count],
+                    similarities[offset:offset + count - 1],
+                    document_name,
+                )
+            )
+            offset += count
         return chunks
 
     def _semantic_split(
-        self, section: DocumentSection, document_name: str
+        self,
+        section: DocumentSection,
+        sentences: List[str],
+        embeddings: np.ndarray,
+        similarities: np.ndarray,
+        document_name: str,
     ) -> List[DocumentChunk]:
-        text = section.content
-        sentences = self._split_sentences(text)
-
         if len(sentences) <= 1:
             return [
                 DocumentChunk(
-                    text=text,
+                    text=section.content,
                     metadata={
-                        "document_name": document_name,
-                        "page_number": section.page_number,
-                        "section_title": section.title,
+                        **section_metadata(section, document_name),
+                        "start_char": section.start_char,
+                        "end_char": section.end_char,
                         "chunk_index": 0,
                         "chunking_strategy": "semantic",
                     },
+                    embedding=self._pooled(embeddings, [0])[0],
                 )
             ]
 
-        embeddings = self.model.encode(sentences, convert_to_numpy=True)
-
-        # Calculate cosine similarities between consecutive sentences
-        similarities = []
-        for i in range(len(embeddings) - 1):
-            sim = np.dot(embeddings[i], embeddings[i + 1]) / (
-                np.linalg.norm(embeddings[i]) * np.linalg.norm(embeddings[i + 1]) + 1e-10
-            )
-            similarities.append(float(sim))
-
-        # Find split points where similarity drops
-        split_indices = [0]
-        for i, sim in enumerate(similarities):
-            if sim < self.threshold:
-                split_indices.append(i + 1)
-        split_indices.append(len(sentences))
+        # Split points where similarity drops
+        split_indices = np.concatenate(
+            ([0], np.flatnonzero(similarities < self.threshold) + 1, [len(sentences)])
+        )
+        pooled = self._pooled(embeddings, split_indices[:-1])
 
         chunks = []
+        locator = SpanLocator(section)
         for idx in range(len(split_indices) - 1):
             start = split_indices[idx]
             end = split_indices[idx + 1]
             chunk_text = " ".join(sentences[start:end])
 
             if chunk_text.strip():
+                # Sentences are re-joined with single spaces, so span first to last sentence
+                start_char, end_char = locator.span(sentences[start])
+                if end - 1 > start:
+                    end_char = locator.span(sentences[end - 1])[1]
                 chunks.append(
                     DocumentChunk(
                         text=chunk_text,
                         metadata={
-                            "document_name": document_name,
-                            "page_number": section.page_number,
-                            "section_title": section.title,
+                            **section_metadata(section, document_name),
+                            "start_char": start_char,
+                            "end_char": end_char,
                             "chunk_index": idx,
                             "chunking_strategy": "semantic",
                         },
+                        embedding=pooled[idx],
                     )
                 )
         return chunks
 
+    def _pooled(self, embeddings: np.ndarray, starts) -> List[Optional[np.ndarray]]:
+        """Unit-normalized mean of the sentence embeddings of each chunk as float32 rows (None if disabled)."""
+        starts = np.asarray(starts, dtype=np.int64)
+        if not self.pooled_embeddings:
+            return [None] * len(starts)
+        counts = np.diff(np.append(starts, len(embeddings)))
+        means = np.add.reduceat(embeddings, starts, axis=0) / counts[:, None]
+        means /= np.linalg.norm(means, axis=1, keepdims=True) + 1e-10
+        return list(means.astype(np.float32, copy=False))
+
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
         sentences = re.split(r"(?<=[.!?])\s+", text)
@@ -7,6 +7,7 @@ from langchain_text_splitters import TokenTextSplitter as LCTokenSplitter
 
 from backend.utils.datatypes import DocumentChunk, DocumentSection
 from backend.utils.config import CONFIG
+from backend.chunking.provenance import SpanLocator
 
 
 class TokenChunker:
@@ -33,15 +34,14 @@ class TokenChunker:
                 continue
             text_to_split = f"{section.title}\n\n{section.content}" if section.title else section.content
             split_texts = self.splitter.split_text(text_to_split)
+            locator = SpanLocator(section)
 
             for i, text in enumerate(split_texts):
                 chunks.append(
                     DocumentChunk(
                         text=text,
                         metadata={
-                            "document_name": document_name,
-                            "page_number": section.page_number,
-                            "section_title": section.title,
+                            **locator.metadata(text, document_name),
                             "chunk_index": i,
                             "chunking_strategy": "token",
                             "chunk_size": self.chunk_size,
@@ -0,0 +1,193 @@
+"""
+Embedding Cache — persistent, content-addressed store of chunk embeddings.
+Keyed by (model name, hash of chunk text) so re-ingesting unchanged text
+skips the transformer entirely.
+
+Layout per model directory (append-only, row i of both files belongs together):
+  keys.bin     16-byte BLAKE2b digests
+  vectors.bin  float16/float32 rows of `dimension` values
+  meta.json    model name, dimension and dtype
+  lock         flock target; appends from several processes are serialized
+
+Stored vectors are unit-normalized embeddings. Rows read back at reduced
+precision are re-normalized: rounding to float16 moves a unit vector's norm
+slightly off 1, which would skew cosine scores against freshly encoded ones.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+from backend.utils.logger import logger
+
+_KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Append-only on-disk embedding cache with memory-mapped reads."""
+
+    def __init__(
+        self,
+        directory: str,
+        model_name: str,
+        dimension: int,
+        dtype: str = "float16",
+        normalized: bool = True,
+    ):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        # Restore unit norm on rows read back below float32 precision
+        self.renormalize = normalized and self.dtype.itemsize < np.dtype(np.float32).itemsize
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_name))
+        self._keys_path = os.path.join(self.directory, "keys.bin")
+        self._vectors_path = os.path.join(self.directory, "vectors.bin")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._lock_path = os.path.join(self.directory, "lock")
+        self._index: Optional[Dict[bytes, int]] = None
+        self._rows = 0  # rows of the files reflected in _index
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(
+            f"{self.model_name}\0{text}".encode("utf-8"), digest_size=_KEY_BYTES
+        ).digest()
+
+    def __len__(self) -> int:
+        with self._lock, self._file_lock(exclusive=self._index is None):
+            return len(self._sync())
+
+    def get_many(self, keys: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up keys in one vectorized gather.
+        Returns (float32 array of shape (len(keys), dimension), boolean hit mask);
+        rows for misses are zero.
+        """
+        out = np.zeros((len(keys), self.dimension), dtype=np.float32)
+        # The first load may repair the files, which needs the exclusive lock
+        with self._lock, self._file_lock(exclusive=self._index is None):
+            index = self._sync()
+            rows = np.fromiter((index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+            hits = rows >= 0
+            if not hits.any():
+                return out, hits
+
+            if self._vectors is None:
+                self._vectors = np.memmap(
+                    self._vectors_path, dtype=self.dtype, mode="r",
+                    shape=(self._rows, self.dimension),
+                )
+            found = self._vectors[rows[hits]].astype(np.float32)
+        if self.renormalize:
+            norms = np.linalg.norm(found, axis=1, keepdims=True)
+            found /= np.where(norms > 0, norms, 1.0)
+        out[hits] = found
+        return out, hits
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """Append new (key, vector) rows; keys already present are skipped."""
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            logger.warning(
+                f"Embedding cache: expected dimension {self.dimension}, got {vectors.shape}; not caching"
+            )
+            return
+
+        # Other processes (API ingest, the ingestion script) append to the same
+        # files: pick up their rows and number ours from the file size, all under
+        # the exclusive lock, so row ids always match the on-disk layout
+        with self._lock, self._file_lock(exclusive=True):
+            index = self._sync(repair=True)
+            new_rows = []
+            for i, key in enumerate(keys):
+                if key not in index:
+                    index[key] = self._rows + len(new_rows)
+                    new_rows.append(i)
+            if not new_rows:
+                return
+
+            # Vectors first: a crash between the writes leaves an orphan row, not a bad key
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows], dtype=self.dtype).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(keys[i] for i in new_rows))
+            self._rows += len(new_rows)
+            self._vectors = None
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Cross-process lock on the cache files: exclusive for writers, shared for readers."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self, repair: bool = False) -> Dict[bytes, int]:
+        """
+        Bring the in-memory index up to date with rows any process appended.
+        Caller holds the file lock; `repair` (exclusive lock only) truncates a
+        tail left by a crashed writer so both files stay row-aligned.
+        """
+        if self._index is None:
+            self._check_meta()
+            repair = True
+            self._index, self._rows = {}, 0
+
+        row_bytes = self.dimension * self.dtype.itemsize
+        keys_size = os.path.getsize(self._keys_path) if os.path.exists(self._keys_path) else 0
+        vectors_size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        rows = min(keys_size // _KEY_BYTES, vectors_size // row_bytes)
+
+        if repair:
+            if keys_size != rows * _KEY_BYTES:
+                with open(self._keys_path, "r+b") as f:
+                    f.truncate(rows * _KEY_BYTES)
+            if vectors_size != rows * row_bytes:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(rows * row_bytes)
+
+        if rows < self._rows:
+            # Files were reset by another process; re-read from the start
+            logger.info(f"Embedding cache at {self.directory} was reset; reloading")
+            self._index, self._rows = {}, 0
+        if rows > self._rows:
+            loaded = self._rows
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._rows * _KEY_BYTES)
+                tail = f.read((rows - self._rows) * _KEY_BYTES)
+            for i in range(rows - self._rows):
+                self._index.setdefault(tail[i * _KEY_BYTES:(i + 1) * _KEY_BYTES], self._rows + i)
+            self._rows = rows
+            self._vectors = None
+            if loaded == 0:
+                logger.info(f"Embedding cache: {rows} vectors for {self.model_name}")
+        return self._index
+
+    def _check_meta(self):
+        """Reset the files when they were written with a different model/dimension/dtype."""
+        meta = {"model_name": self.model_name, "dimension": self.dimension, "dtype": self.dtype.str}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                if json.load(f) != meta:
+                    logger.warning(f"Embedding cache at {self.directory} has a different layout; resetting")
+                    for path in (self._keys_path, self._vectors_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
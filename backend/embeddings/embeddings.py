@@ -1,11 +1,15 @@
 """
 Embedding Module — generates embeddings using sentence-transformers (all-MiniLM-L6-v2).
+Query embeddings are memoized in a bounded LRU/TTL cache keyed by normalized text;
+document embeddings go through a persistent content-addressed cache on disk.
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from backend.embeddings.embedding_cache import EmbeddingCache
+from backend.utils.cache import LRUCache
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
 
@@ -18,6 +22,19 @@ class EmbeddingEngine:
         self.batch_size = CONFIG.embedding.batch_size
         self.device = CONFIG.embedding.device
         self._model: Optional[SentenceTransformer] = None
+        self._query_cache = LRUCache(
+            maxsize=CONFIG.embedding.query_cache_size,
+            ttl=CONFIG.embedding.query_cache_ttl,
+        )
+        self._lowercase: Optional[bool] = None
+        self._doc_cache: Optional[EmbeddingCache] = None
+        if CONFIG.embedding.cache_enabled:
+            self._doc_cache = EmbeddingCache(
+                CONFIG.embedding.cache_dir,
+                self.model_name,
+                CONFIG.embedding.dimension,
+                dtype=CONFIG.embedding.cache_dtype,
+            )
 
     @property
     def model(self) -> SentenceTransformer:
@@ -30,18 +47,81 @@ class EmbeddingEngine:
     def dimension(self) -> int:
         return CONFIG.embedding.dimension
 
+    def warm_up(self):
+        """Load the model and run one encode, so the first query pays no start-up cost."""
+        self._encode(["warm up"])
+
     def embed_text(self, text: str) -> List[float]:
-        """Embed a single text string."""
-        embedding = self.model.encode(
-            text, convert_to_numpy=True, device=self.device, normalize_embeddings=True
-        )
-        return embedding.tolist()
+        """Embed a single query string (list wrapper around embed_queries_array)."""
+        return self.embed_queries_array([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """List-returning compatibility wrapper around embed_queries_array."""
+        return self.embed_queries_array(texts).tolist()
+
+    def embed_queries_array(self, texts: List[str]) -> np.ndarray:
+        """Embed query strings as a (n, dim) float32 array, encoding only cache misses."""
+        out = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return out
+
+        keys = [self._query_key(text) for text in texts]
+        missing = []
+        for i, key in enumerate(keys):
+            vec = self._query_cache.get(key)
+            if vec is None:
+                missing.append(i)
+            else:
+                out[i] = vec
+
+        if missing:
+            encoded = self.model.encode(
+                [texts[i] for i in missing],
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                device=self.device,
+                normalize_embeddings=True,
+            )
+            out[missing] = encoded
+            for i in missing:
+                self._query_cache.put(keys[i], out[i].copy())
+
+        return out
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Embed multiple texts in batches."""
+        """List-returning compatibility wrapper around embed_texts_array."""
+        return self.embed_texts_array(texts).tolist()
+
+    def embed_texts_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed multiple texts in batches as a contiguous (n, dim) float32 array,
+        reusing cached embeddings of unchanged text.
+        """
         if not texts:
-            return []
-        embeddings = self.model.encode(
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self._doc_cache is None:
+            return np.ascontiguousarray(self._encode(texts), dtype=np.float32)
+
+        keys = [self._doc_cache.key(text) for text in texts]
+        vectors, hits = self._doc_cache.get_many(keys)
+
+        # Encode each distinct uncached text once
+        missing: Dict[bytes, List[int]] = {}
+        for i in np.flatnonzero(~hits):
+            missing.setdefault(keys[i], []).append(int(i))
+        if missing:
+            logger.info(
+                f"Embedding cache: {int(hits.sum())} hits, encoding {len(missing)} new texts"
+            )
+            encoded = self._encode([texts[rows[0]] for rows in missing.values()])
+            self._doc_cache.put_many(list(missing), encoded)
+            for vec, rows in zip(encoded, missing.values()):
+                vectors[rows] = vec
+
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
             texts,
             batch_size=self.batch_size,
             convert_to_numpy=True,
@@ -49,7 +129,20 @@ class EmbeddingEngine:
             show_progress_bar=len(texts) > 50,
             normalize_embeddings=True,
         )
-        return embeddings.tolist()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the query embedding cache."""
+        return self._query_cache.stats()
+
+    def _query_key(self, text: str):
+        """Cache key: model name + whitespace-normalized text (case-folded for uncased models)."""
+        normalized = " ".join(text.split())
+        if self._lowercase is None:
+            tokenizer = getattr(self.model, "tokenizer", None)
+            self._lowercase = bool(getattr(tokenizer, "do_lower_case", False))
+        if self._lowercase:
+            normalized = normalized.lower()
+        return (self.model_name, normalized)
 
     def cosine_similarity(self, vec_a: List[float], vec_b: List[float]) -> float:
         """Compute cosine similarity between two vectors."""
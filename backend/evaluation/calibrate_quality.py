@@ -0,0 +1,215 @@
+"""
+Retrieval-Quality Calibration — fits the RetrievalQualityEstimator constants,
+signal weights and expansion threshold on evaluation_queries.json.
+
+Every query yields two labelled samples:
+  * its real first pass — good when the relevant document is in the fused top-k
+  * a hard negative — the same query retrieved with its relevant document
+    excluded, i.e. what the estimator sees when the corpus does not answer it
+
+The fit places the dense floor / ceiling at the mean top-1 similarity of the
+bad / good samples, scales the gap by the mean good-sample gap, weights each
+signal by how far it separates the two groups, and picks the threshold with
+the best balanced accuracy (fewest expansions on ties). The result is written
+to retrieval.quality_calibration_path, where the estimator picks it up.
+
+Usage: python -m backend.evaluation.calibrate_quality [--k 5] [--hyde] [--dry-run]
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.embeddings.embeddings import EmbeddingEngine
+from backend.vectorstore.chroma_store import ChromaStore
+from backend.retrieval.dense_retriever import DenseRetriever
+from backend.retrieval.bm25_retriever import BM25Retriever
+from backend.retrieval.hybrid_retriever import HybridRetriever
+from backend.retrieval.quality import QualityCalibration, RetrievalQualityEstimator, raw_signals
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import RetrievalResult
+from backend.utils.logger import logger
+
+_SIGNALS = ("dense_top1", "dense_gap", "bm25_coverage")
+# Below this many samples the fitted values are reported as provisional
+_MIN_SAMPLES = 20
+
+
+def _documents(results: List[RetrievalResult]) -> List[str]:
+    return [r.chunk.metadata.get("document_name", "Unknown") for r in results]
+
+
+def collect_samples(
+    hybrid_retriever: HybridRetriever, queries: List[Dict[str, str]], k: int
+) -> Tuple[List[Dict[str, float]], List[bool], List[bool]]:
+    """
+    Raw signals and good/bad labels for every sample, plus whether each
+    query's real first pass found its relevant document (first len(queries)
+    samples are the real first passes, the rest the hard negatives).
+    """
+    fetch_k = k * 2  # what HybridRetriever hands the estimator
+    real, negatives, hits = [], [], []
+    for q in queries:
+        query, expected = q["query"], q["relevant_doc"]
+
+        fused, dense, bm25 = hybrid_retriever.retrieve_detailed(query, top_k=k)
+        hit = expected in _documents(fused)
+        hits.append(hit)
+        real.append((raw_signals(query, dense, bm25), hit))
+
+        dense_neg = hybrid_retriever.dense.retrieve(
+            query, top_k=fetch_k, filters={"document_name": {"$ne": expected}}
+        )
+        bm25_neg = [
+            r for r in hybrid_retriever.bm25.retrieve(query, top_k=fetch_k * 3)
+            if r.chunk.metadata.get("document_name") != expected
+        ][:fetch_k]
+        negatives.append((raw_signals(query, dense_neg, bm25_neg), False))
+
+    samples = real + negatives
+    return [s for s, _ in samples], [label for _, label in samples], hits
+
+
+def fit(signals: List[Dict[str, float]], labels: List[bool]) -> QualityCalibration:
+    """Fit normalization constants, weights and threshold to labelled raw signals."""
+    labels = np.asarray(labels)
+    raw = {name: np.array([s[name] for s in signals]) for name in _SIGNALS}
+    calibration = QualityCalibration(embedding_model=CONFIG.embedding.model_name)
+    if labels.all() or not labels.any():
+        logger.warning("Calibration needs both good and bad samples; keeping defaults")
+        return calibration
+
+    good, bad = labels, ~labels
+    floor = float(raw["dense_top1"][bad].mean())
+    ceiling = float(raw["dense_top1"][good].mean())
+    calibration.dense_floor = round(floor, 4)
+    calibration.dense_ceiling = round(max(ceiling, floor + 0.05), 4)
+    calibration.gap_scale = round(max(float(raw["dense_gap"][good].mean()), 0.01), 4)
+
+    estimator = RetrievalQualityEstimator(calibration=calibration)
+    normalized = [estimator.normalize(s) for s in signals]
+    separation = {
+        name: max(
+            0.0,
+            float(np.mean([n[name] for n, g in zip(normalized, good) if g]))
+            - float(np.mean([n[name] for n, g in zip(normalized, good) if not g])),
+        )
+        for name in _SIGNALS
+    }
+    total = sum(separation.values())
+    if total > 0:
+        calibration.weights = {name: round(value / total, 4) for name, value in separation.items()}
+    estimator.weights = calibration.weights
+
+    scores = np.array([estimator.combine(n) for n in normalized])
+    calibration.threshold = round(_best_threshold(scores, good), 4)
+    return calibration
+
+
+def _best_threshold(scores: np.ndarray, good: np.ndarray) -> float:
+    """Threshold with the best balanced accuracy; ties go to the one expanding least."""
+    ordered = np.unique(scores)
+    candidates = np.concatenate([[0.0], (ordered[:-1] + ordered[1:]) / 2, [ordered[-1] + 1e-6]])
+    best, best_key = 0.0, None
+    for threshold in candidates:
+        expand = scores < threshold
+        balanced = (expand[~good].mean() + (~expand[good]).mean()) / 2
+        key = (balanced, -expand.mean())
+        if best_key is None or key > best_key:
+            best, best_key = float(threshold), key
+    return best
+
+
+def evaluate(
+    calibration: QualityCalibration,
+    signals: List[Dict[str, float]],
+    labels: List[bool],
+    hits: List[bool],
+) -> Dict[str, float]:
+    """Expansion rate and first-pass recall of the real queries at the fitted threshold."""
+    estimator = RetrievalQualityEstimator(calibration=calibration)
+    n = len(hits)
+    expand = np.array([estimator.combine(estimator.normalize(s)) < estimator.threshold for s in signals])
+    bad = ~np.asarray(labels)
+    return {
+        "queries": n,
+        "samples": len(signals),
+        "expansion_rate": round(float(expand[:n].mean()), 4),
+        # Share of bad first passes (failures + hard negatives) sent to expansion
+        "bad_sample_recall": round(float(expand[bad].mean()), 4) if bad.any() else 0.0,
+        "first_pass_recall": round(float(np.mean(hits)), 4),
+    }
+
+
+def hyde_recall(
+    hybrid_retriever: HybridRetriever,
+    queries: List[Dict[str, str]],
+    hits: List[bool],
+    expanded: List[bool],
+    k: int,
+) -> float:
+    """Recall@k of the gated pipeline: HyDE (needs Ollama) for expanded queries only."""
+    from backend.retrieval.query_expander import QueryExpander
+
+    expander = QueryExpander(hybrid_retriever)
+    found = 0
+    for q, hit, expand in zip(queries, hits, expanded):
+        if expand:
+            hit = q["relevant_doc"] in _documents(expander.hyde_retrieve(q["query"], top_k=k))
+        found += hit
+    return round(found / len(queries), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the retrieval-quality estimator")
+    parser.add_argument("--k", type=int, default=CONFIG.retrieval.top_k)
+    parser.add_argument("--hyde", action="store_true", help="also measure gated recall with HyDE (Ollama)")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing the calibration")
+    args = parser.parse_args()
+
+    queries_path = Path(__file__).parent / "evaluation_queries.json"
+    with open(queries_path, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    embedding_engine = EmbeddingEngine()
+    chroma_store = ChromaStore()
+    dense_retriever = DenseRetriever(chroma_store, embedding_engine)
+    bm25_retriever = BM25Retriever(chroma_store)
+    hybrid_retriever = HybridRetriever(dense_retriever, bm25_retriever)
+    hybrid_retriever.warm_up()
+
+    logger.info(f"Calibrating retrieval quality on {len(queries)} queries (top_{args.k})...")
+    signals, labels, hits = collect_samples(hybrid_retriever, queries, args.k)
+    calibration = fit(signals, labels)
+    report = evaluate(calibration, signals, labels, hits)
+    if args.hyde:
+        estimator = RetrievalQualityEstimator(calibration=calibration)
+        expanded = [
+            estimator.combine(estimator.normalize(s)) < estimator.threshold
+            for s in signals[:len(queries)]
+        ]
+        report["gated_recall"] = hyde_recall(hybrid_retriever, queries, hits, expanded, args.k)
+    calibration.report = report
+
+    print("\n## Retrieval Quality Calibration\n")
+    print(f"Dense floor / ceiling : {calibration.dense_floor:.4f} / {calibration.dense_ceiling:.4f}")
+    print(f"Gap scale             : {calibration.gap_scale:.4f}")
+    print(f"Weights               : {calibration.weights}")
+    print(f"Threshold             : {calibration.threshold:.4f}")
+    print(f"Expansion rate        : {report['expansion_rate']:.2f}")
+    print(f"Bad-sample recall     : {report['bad_sample_recall']:.2f}")
+    print(f"First-pass Recall@{args.k}   : {report['first_pass_recall']:.2f}")
+    if "gated_recall" in report:
+        print(f"Gated Recall@{args.k}        : {report['gated_recall']:.2f}")
+    if report["samples"] < _MIN_SAMPLES:
+        print(f"\nOnly {report['samples']} samples: add queries to {queries_path.name} before relying on the fit.")
+
+    if not args.dry_run:
+        calibration.save()
+        print(f"\nCalibration written to {CONFIG.retrieval.quality_calibration_path}")
+
+
+if __name__ == "__main__":
+    main()
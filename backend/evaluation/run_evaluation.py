@@ -28,6 +28,8 @@ def main():
     dense_retriever = DenseRetriever(chroma_store, embedding_engine)
     bm25_retriever = BM25Retriever(chroma_store)
     hybrid_retriever = HybridRetriever(dense_retriever, bm25_retriever)
+    # Keep model / index loading out of the per-leg deadlines of the first queries
+    hybrid_retriever.warm_up()
 
     # Note: Evaluator assumes ChromaDB has already been populated with documents and BM25 index built.
     
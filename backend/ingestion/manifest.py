@@ -0,0 +1,165 @@
+"""
+Ingestion Manifest — records every ingested file (path, size, mtime, content
+hash, chunk ids, chunking strategy) so re-ingestion only touches files that
+were added, changed or removed since the last run.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel, Field
+
+from backend.utils.config import CONFIG
+from backend.utils.logger import logger
+
+MANIFEST_VERSION = 1
+
+
+class ManifestEntry(BaseModel):
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    chunking_strategy: str
+    chunk_ids: List[str] = Field(default_factory=list)
+
+
+class ManifestDiff(BaseModel):
+    added: List[str] = Field(default_factory=list)
+    changed: List[str] = Field(default_factory=list)
+    removed: List[str] = Field(default_factory=list)
+    unchanged: List[str] = Field(default_factory=list)
+
+    @property
+    def to_process(self) -> List[str]:
+        return self.added + self.changed
+
+
+class IngestionManifest:
+    """JSON manifest of ingested files, stored next to the vector store."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(
+            CONFIG.chroma.persist_directory, f"{CONFIG.chroma.collection_name}.manifest.json"
+        )
+        self._entries: Optional[Dict[str, ManifestEntry]] = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> Dict[str, ManifestEntry]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, file_path: str) -> Optional[ManifestEntry]:
+        return self.entries.get(os.path.abspath(file_path))
+
+    def diff(
+        self, file_paths: Iterable[str], strategy: str, scope: str = None
+    ) -> ManifestDiff:
+        """
+        Compare files on disk against the manifest. Size and mtime are checked
+        first; files are only hashed when those differ. Entries under `scope`
+        (a directory) that are no longer on disk are reported as removed.
+        """
+        result = ManifestDiff()
+        seen = set()
+        for file_path in file_paths:
+            path = os.path.abspath(file_path)
+            seen.add(path)
+            entry = self.entries.get(path)
+            if entry is None:
+                result.added.append(path)
+                continue
+
+            stat = os.stat(path)
+            if entry.chunking_strategy != strategy:
+                result.changed.append(path)
+            elif entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+                result.unchanged.append(path)
+            elif entry.size == stat.st_size and entry.sha256 == file_sha256(path):
+                # Touched but identical: refresh mtime so it is not re-hashed next time
+                entry.mtime = stat.st_mtime
+                self._dirty = True
+                result.unchanged.append(path)
+            else:
+                result.changed.append(path)
+
+        if scope is not None:
+            scope = os.path.join(os.path.abspath(scope), "")
+            result.removed = [
+                path for path in self.entries
+                if path.startswith(scope) and path not in seen
+            ]
+
+        logger.info(
+            f"Manifest diff: {len(result.added)} added, {len(result.changed)} changed, "
+            f"{len(result.removed)} removed, {len(result.unchanged)} unchanged"
+        )
+        return result
+
+    def record(self, file_path: str, chunk_ids: List[str], strategy: str):
+        """Record a file whose chunks have all been written to the store."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        self.entries[path] = ManifestEntry(
+            path=path,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            sha256=file_sha256(path),
+            chunking_strategy=strategy,
+            chunk_ids=chunk_ids,
+        )
+        self._dirty = True
+
+    def remove(self, file_path: str) -> Optional[ManifestEntry]:
+        entry = self.entries.pop(os.path.abspath(file_path), None)
+        if entry is not None:
+            self._dirty = True
+        return entry
+
+    def clear(self):
+        self._entries = {}
+        self._dirty = True
+
+    def save(self):
+        """Atomically write the manifest if it changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "files": [entry.model_dump() for entry in self.entries.values()],
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        logger.info(f"Manifest saved: {len(self.entries)} files")
+
+    def _load(self) -> Dict[str, ManifestEntry]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"unsupported version {payload.get('version')}")
+            entries = [ManifestEntry(**item) for item in payload.get("files", [])]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+        return {entry.path: entry for entry in entries}
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,102 +1,181 @@
 """
 PDF Loader — Extracts text and formatting metadata from PDFs using PyMuPDF.
+
+Pages are produced lazily (`iter_pages` / `iter_directory`) so downstream
+stages can consume and discard them. Formatting spans are kept as one compact
+NumPy structured array per page (see SPAN_DTYPE) rather than a dict per span;
+span text is recovered as page.text[start:end].
+
+The extraction mode (ingestion.extraction_mode) selects between the per-span
+"dict" walk and PyMuPDF's much cheaper plain-text blocks; "auto" only pays for
+spans when the chunking strategy makes use of inferred headings.
 """
 import os
-from typing import List
+from typing import Iterator, List, Optional
 
 import fitz  # PyMuPDF
+import numpy as np
 
-from backend.utils.datatypes import DocumentPage
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import ChunkingStrategy, DocumentPage, ExtractionMode
 from backend.utils.logger import logger
 
+# One record per text span; offsets index into the (stripped) page text
+SPAN_DTYPE = np.dtype([
+    ("start", np.int32),
+    ("end", np.int32),
+    ("size", np.float32),
+    ("bold", np.bool_),
+    ("italic", np.bool_),
+])
+
+# Strategies that split on size alone and never look at section headings
+_PLAIN_TEXT_STRATEGIES = {ChunkingStrategy.RECURSIVE, ChunkingStrategy.TOKEN}
+
 
 class PDFLoader:
     """Load PDFs and extract page-level text with formatting metadata."""
 
-    def load(self, file_path: str) -> List[DocumentPage]:
+    def __init__(self, extraction_mode: str = None):
+        self.extraction_mode = ExtractionMode(extraction_mode or CONFIG.ingestion.extraction_mode)
+
+    def resolve_mode(self, strategy: Optional[ChunkingStrategy] = None) -> ExtractionMode:
+        """Concrete extraction mode for a chunking strategy (AUTO without one means DICT)."""
+        if self.extraction_mode != ExtractionMode.AUTO:
+            return self.extraction_mode
+        if strategy is not None and ChunkingStrategy(strategy) in _PLAIN_TEXT_STRATEGIES:
+            return ExtractionMode.TEXT
+        return ExtractionMode.DICT
+
+    def load(self, file_path: str, strategy: ChunkingStrategy = None) -> List[DocumentPage]:
         """Load a single PDF and return a list of DocumentPage objects."""
+        return list(self.iter_pages(file_path, strategy))
+
+    def iter_pages(self, file_path: str, strategy: ChunkingStrategy = None) -> Iterator[DocumentPage]:
+        """Yield the non-empty pages of a PDF one at a time."""
+        mode = self.resolve_mode(strategy)
+        extract = self._extract_page if mode == ExtractionMode.DICT else self._extract_plain_page
         if not os.path.exists(file_path):
             logger.error(f"PDF not found: {file_path}")
-            return []
+            return
 
-        pages = []
+        doc_name = os.path.basename(file_path)
+        loaded = 0
         try:
             doc = fitz.open(file_path)
-            doc_name = os.path.basename(file_path)
-
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)["blocks"]
-
-                page_text = ""
-                formatting_spans = []
-
-                for block in blocks:
-                    if block["type"] != 0:  # text block only
-                        continue
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            text = span["text"]
-                            font = span.get("font", "")
-                            size = span.get("size", 10)
-                            flags = span.get("flags", 0)
-
-                            is_bold = bool(flags & 2**4) or "Bold" in font or "bold" in font
-                            is_italic = bool(flags & 2**1) or "Italic" in font or "italic" in font
-
-                            span_info = {
-                                "text": text,
-                                "font": font,
-                                "size": round(size, 1),
-                                "bold": is_bold,
-                                "italic": is_italic,
-                                "start": len(page_text),
-                                "end": len(page_text) + len(text),
-                            }
-                            formatting_spans.append(span_info)
-                            page_text += text
-
-                        page_text += "\n"
-                    page_text += "\n"
-
-                if page_text.strip():
-                    pages.append(
-                        DocumentPage(
-                            page_number=page_num + 1,
-                            text=page_text.strip(),
-                            metadata={
-                                "document_name": doc_name,
-                                "file_path": file_path,
-                                "total_pages": len(doc),
-                                "formatting_spans": formatting_spans,
-                            },
-                        )
-                    )
+        except Exception as e:
+            logger.error(f"Failed to load PDF {file_path}: {e}")
+            return
 
-            doc.close()
-            logger.info(f"Loaded {len(pages)} pages from {doc_name}")
+        try:
+            total_pages = len(doc)
+            for page_num in range(total_pages):
+                page = extract(doc[page_num], page_num + 1)
+                if page is None:
+                    continue
+                page.metadata.update({
+                    "document_name": doc_name,
+                    "file_path": file_path,
+                    "total_pages": total_pages,
+                })
+                loaded += 1
+                yield page
+            logger.info(f"Loaded {loaded} pages from {doc_name}")
 
         except Exception as e:
             logger.error(f"Failed to load PDF {file_path}: {e}")
+        finally:
+            doc.close()
 
-        return pages
-
-    def load_directory(self, directory: str) -> List[DocumentPage]:
-        """Load all PDFs from a directory."""
-        all_pages = []
-        pdf_files = sorted(
-            [f for f in os.listdir(directory) if f.lower().endswith(".pdf")]
+    def _extract_plain_page(self, page, page_number: int):
+        """Extract one page's text from plain-text blocks (no spans); None if empty."""
+        blocks = page.get_text("blocks", flags=fitz.TEXT_PRESERVE_WHITESPACE)
+
+        # Same layout as the dict walk: one line per text line, blank line after each block
+        parts: List[str] = []
+        for block in blocks:
+            if block[6] != 0:  # text block only
+                continue
+            text = block[4]
+            parts.append(text if text.endswith("\n") else text + "\n")
+            parts.append("\n")
+
+        page_text = "".join(parts).strip()
+        if not page_text:
+            return None
+        return DocumentPage(page_number=page_number, text=page_text, metadata={})
+
+    def _extract_page(self, page, page_number: int):
+        """Extract one page's text and span array; None for pages without text."""
+        blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)["blocks"]
+
+        parts: List[str] = []
+        spans: List[tuple] = []
+        offset = 0
+
+        for block in blocks:
+            if block["type"] != 0:  # text block only
+                continue
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    text = span["text"]
+                    font = span.get("font", "")
+                    flags = span.get("flags", 0)
+
+                    is_bold = bool(flags & 2**4) or "Bold" in font or "bold" in font
+                    is_italic = bool(flags & 2**1) or "Italic" in font or "italic" in font
+
+                    spans.append(
+                        (offset, offset + len(text), round(span.get("size", 10), 1), is_bold, is_italic)
+                    )
+                    parts.append(text)
+                    offset += len(text)
+
+                parts.append("\n")
+                offset += 1
+            parts.append("\n")
+            offset += 1
+
+        raw_text = "".join(parts)
+        page_text = raw_text.strip()
+        if not page_text:
+            return None
+
+        # Re-base offsets onto the stripped text
+        lead = len(raw_text) - len(raw_text.lstrip())
+        span_array = np.array(spans, dtype=SPAN_DTYPE)
+        span_array["start"] = np.clip(span_array["start"] - lead, 0, len(page_text))
+        span_array["end"] = np.clip(span_array["end"] - lead, 0, len(page_text))
+
+        return DocumentPage(
+            page_number=page_number,
+            text=page_text,
+            metadata={"formatting_spans": span_array},
         )
 
+    @staticmethod
+    def list_pdfs(directory: str) -> List[str]:
+        """Return the sorted paths of all PDFs in a directory."""
+        return [
+            os.path.join(directory, f)
+            for f in sorted(os.listdir(directory))
+            if f.lower().endswith(".pdf")
+        ]
+
+    def iter_directory(self, directory: str) -> Iterator[DocumentPage]:
+        """Yield the pages of every PDF in a directory, one PDF after another."""
+        pdf_files = self.list_pdfs(directory)
+
         if not pdf_files:
             logger.warning(f"No PDF files found in {directory}")
-            return all_pages
+            return
 
         logger.info(f"Loading {len(pdf_files)} PDFs from {directory}...")
-        for pdf_file in pdf_files:
-            file_path = os.path.join(directory, pdf_file)
-            pages = self.load(file_path)
-            all_pages.extend(pages)
+        for file_path in pdf_files:
+            yield from self.iter_pages(file_path)
 
+    def load_directory(self, directory: str) -> List[DocumentPage]:
+        """Load all PDFs from a directory."""
+        all_pages = list(self.iter_directory(directory))
         logger.info(f"Total pages loaded: {len(all_pages)}")
         return all_pages
@@ -0,0 +1,275 @@
+"""
+Ingestion Pipeline — streams PDFs through parsing, preprocessing, structure
+detection and chunking in a process pool, then embeds and writes the chunks
+in bounded batches from the parent process.
+
+Workers run backend/ingestion/worker.py, which imports no embedding model or
+vector store, so a spawned parser costs an interpreter plus PyMuPDF only.
+Only `max_pending_documents` documents are in flight at a time, and pages never
+leave the worker that parsed them, so memory is bounded by a window of
+documents plus one embedding batch rather than by the corpus.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Deque, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from backend.chunking.chunking_manager import ChunkingManager
+from backend.embeddings.embeddings import EmbeddingEngine
+from backend.ingestion.manifest import IngestionManifest
+from backend.ingestion.pdf_loader import PDFLoader
+from backend.ingestion.worker import PARENT_CHUNKED, process_document
+from backend.retrieval.bm25_retriever import BM25Retriever
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import ChunkingStrategy, DocumentChunk
+from backend.utils.logger import logger
+from backend.vectorstore.chroma_store import ChromaStore
+
+# Cap on the default parser process count (ingestion.workers = 0)
+_DEFAULT_MAX_WORKERS = 4
+
+
+class IngestionStats(BaseModel):
+    documents: int = 0
+    pages: int = 0
+    sections: int = 0
+    chunks: int = 0
+    failed: List[str] = Field(default_factory=list)
+    # Delta sync counts (files)
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+class IngestionPipeline:
+    """Parallel PDF → chunks → embeddings → ChromaDB pipeline with back-pressure."""
+
+    def __init__(
+        self,
+        embedder: EmbeddingEngine,
+        store: ChromaStore,
+        chunking_manager: ChunkingManager,
+        bm25_retriever: Optional[BM25Retriever] = None,
+        manifest: Optional[IngestionManifest] = None,
+        workers: int = None,
+        max_pending_documents: int = None,
+        embed_batch_size: int = None,
+    ):
+        self.embedder = embedder
+        self.store = store
+        self.chunking_manager = chunking_manager
+        self.bm25_retriever = bm25_retriever
+        self.manifest = manifest or IngestionManifest(
+            os.path.join(store.persist_directory, f"{store.collection_name}.manifest.json")
+        )
+        self.workers = workers or CONFIG.ingestion.workers or min(_DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+        self.max_pending = (
+            max_pending_documents or CONFIG.ingestion.max_pending_documents or 2 * self.workers
+        )
+        self.embed_batch_size = embed_batch_size or CONFIG.ingestion.embed_batch_size
+        # The API runs ingestion in worker threads; syncs must not interleave
+        self._lock = threading.RLock()
+
+    def sync_directory(self, directory: str, strategy: ChunkingStrategy = None) -> IngestionStats:
+        """
+        Bring the store in line with the PDFs in a directory: ingest added and
+        changed files and drop the chunks of files that were removed.
+        """
+        with self._lock:
+            if not len(self.manifest) and self.store.count():
+                # Store predates the manifest: its chunks cannot be attributed to files
+                logger.warning("No ingestion manifest for a non-empty store; rebuilding")
+                return self.rebuild(directory, strategy)
+            return self._sync(PDFLoader.list_pdfs(directory), strategy, scope=directory)
+
+    def sync_files(self, file_paths: List[str], strategy: ChunkingStrategy = None) -> IngestionStats:
+        """Ingest the given files if they are new or changed (never removes other files)."""
+        with self._lock:
+            return self._sync(file_paths, strategy, scope=None)
+
+    def rebuild(self, directory: str, strategy: ChunkingStrategy = None) -> IngestionStats:
+        """Drop the collection and manifest, then ingest every PDF in the directory."""
+        with self._lock:
+            with self._index_update():
+                self.store.delete_collection()
+                if self.bm25_retriever is not None:
+                    self.bm25_retriever.reset()
+            self.manifest.clear()
+            return self._sync(PDFLoader.list_pdfs(directory), strategy, scope=directory)
+
+    def _sync(
+        self, file_paths: List[str], strategy: Optional[ChunkingStrategy], scope: Optional[str]
+    ) -> IngestionStats:
+        strategy = strategy or ChunkingStrategy(CONFIG.chunking.default_strategy)
+        diff = self.manifest.diff(file_paths, strategy.value, scope=scope)
+
+        try:
+            # Changed files are dropped from the manifest until re-ingested successfully
+            stale_ids = []
+            for path in diff.changed + diff.removed:
+                entry = self.manifest.remove(path)
+                if entry is not None:
+                    stale_ids.extend(entry.chunk_ids)
+            if stale_ids:
+                with self._index_update():
+                    self.store.delete_chunks(stale_ids)
+                    if self.bm25_retriever is not None:
+                        self.bm25_retriever.delete_chunks(stale_ids)
+
+            stats = self.run(
+                diff.to_process,
+                strategy,
+                on_document=lambda path, ids: self.manifest.record(path, ids, strategy.value),
+            )
+        finally:
+            self.manifest.save()
+
+        stats.added = len(diff.added)
+        stats.changed = len(diff.changed)
+        stats.removed = len(diff.removed)
+        stats.unchanged = len(diff.unchanged)
+        return stats
+
+    def run(
+        self,
+        file_paths: Iterable[str],
+        strategy: ChunkingStrategy = None,
+        on_document: Optional[Callable[[str, List[str]], None]] = None,
+    ) -> IngestionStats:
+        """
+        Ingest the given PDFs and return aggregate statistics. `on_document` is
+        called with (file_path, chunk_ids) once all of a document's chunks have
+        been written.
+        """
+        strategy = strategy or ChunkingStrategy(CONFIG.chunking.default_strategy)
+        stats = IngestionStats()
+        buffer: List[DocumentChunk] = []
+        # (file_path, chunk_ids, cumulative chunk count at the end of the document)
+        open_documents: Deque[Tuple[str, List[str], int]] = deque()
+        written = 0
+
+        def complete_documents():
+            while open_documents and open_documents[0][2] <= written:
+                path, ids, _ = open_documents.popleft()
+                if on_document is not None:
+                    on_document(path, ids)
+
+        for result in self._process_all(list(file_paths), strategy, stats):
+            stats.documents += 1
+            stats.pages += result.pages
+            stats.sections += result.num_sections
+
+            chunks = result.chunks
+            if strategy in PARENT_CHUNKED and result.sections:
+                chunks = self.chunking_manager.chunk_sections(
+                    result.sections, document_name=result.document_name, strategy=strategy
+                )
+            buffer.extend(chunks)
+            stats.chunks += len(chunks)
+            open_documents.append((result.file_path, [c.id for c in chunks], stats.chunks))
+
+            while len(buffer) >= self.embed_batch_size:
+                self._write(buffer[: self.embed_batch_size])
+                written += self.embed_batch_size
+                buffer = buffer[self.embed_batch_size:]
+            complete_documents()
+
+        if buffer:
+            self._write(buffer)
+            written += len(buffer)
+        complete_documents()
+
+        logger.info(
+            f"Ingestion pipeline: {stats.documents} documents, {stats.pages} pages, "
+            f"{stats.chunks} chunks ({len(stats.failed)} failed)"
+        )
+        return stats
+
+    def _process_all(self, file_paths: List[str], strategy: ChunkingStrategy, stats: IngestionStats):
+        """Yield per-document results, keeping at most `max_pending` documents in flight."""
+        if self.workers <= 1 or len(file_paths) <= 1:
+            for path in file_paths:
+                try:
+                    yield process_document(path, strategy.value)
+                except Exception as e:
+                    logger.error(f"Failed to process {path}: {e}")
+                    stats.failed.append(os.path.basename(path))
+            return
+
+        logger.info(f"Ingestion pipeline: {len(file_paths)} PDFs across {self.workers} workers")
+        paths = iter(file_paths)
+        # Spawn, not fork: the API process holds torch/OpenMP pools, executor
+        # threads and open sqlite/HTTP handles that a forked child could deadlock on
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            pending: Set[Future] = set()
+            owners = {}
+
+            def submit_next() -> bool:
+                path = next(paths, None)
+                if path is None:
+                    return False
+                future = pool.submit(process_document, path, strategy.value)
+                owners[future] = path
+                pending.add(future)
+                return True
+
+            while len(pending) < self.max_pending and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    path = owners.pop(future)
+                    submit_next()
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to process {path}: {e}")
+                        stats.failed.append(os.path.basename(path))
+
+    def _write(self, chunks: List[DocumentChunk]):
+        """
+        Write one bounded batch: parent chunks go to the parent store as plain
+        text, only retrievable chunks are embedded and indexed.
+        """
+        parents = [c for c in chunks if c.metadata.get("is_parent")]
+        children = [c for c in chunks if not c.metadata.get("is_parent")]
+        embeddings = self._embed(children) if children else None
+
+        with self._index_update():
+            if parents:
+                self.store.add_parent_chunks(parents)
+            if children:
+                self.store.add_documents(children, embeddings)
+                if self.bm25_retriever is not None:
+                    self.bm25_retriever.add_chunks(children)
+
+    def _index_update(self):
+        """Keep BM25 queries out while store writes are mirrored into the index."""
+        if self.bm25_retriever is None:
+            return nullcontext()
+        return self.bm25_retriever.updating()
+
+    def _embed(self, chunks: List[DocumentChunk]) -> np.ndarray:
+        """Embeddings for a batch, encoding only chunks without a precomputed one."""
+        missing = [i for i, chunk in enumerate(chunks) if chunk.embedding is None]
+        if len(missing) == len(chunks):
+            return self.embedder.embed_texts_array([chunk.text for chunk in chunks])
+
+        # Chunkers that already embedded their text (semantic chunking) are not re-encoded
+        embeddings = np.empty((len(chunks), self.embedder.dimension), dtype=np.float32)
+        present = [i for i, chunk in enumerate(chunks) if chunk.embedding is not None]
+        embeddings[present] = np.stack([chunks[i].embedding for i in present])
+        if missing:
+            embeddings[missing] = self.embedder.embed_texts_array([chunks[i].text for i in missing])
+        return embeddings
@@ -0,0 +1,88 @@
+"""
+Ingestion Worker — the per-document stage run inside the pipeline's spawned
+parser processes: parse, clean, detect structure and chunk one PDF.
+
+Spawned workers re-import this module, so it deliberately stays free of the
+embedding model, ChromaDB and the BM25 index: only the PDF loader, the
+preprocessors and the chunkers that need no embeddings are imported here.
+"""
+import os
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from backend.chunking.markdown_chunker import MarkdownChunker
+from backend.chunking.parent_child_chunker import ParentChildChunker
+from backend.chunking.recursive_chunker import RecursiveChunker
+from backend.chunking.token_chunker import TokenChunker
+from backend.ingestion.pdf_loader import PDFLoader
+from backend.preprocessing.preprocessor import TextPreprocessor
+from backend.preprocessing.structure_detector import StructureDetector
+from backend.utils.datatypes import ChunkingStrategy, DocumentChunk, DocumentSection
+
+# Strategies that need the embedding model run their chunking in the parent process
+PARENT_CHUNKED = {ChunkingStrategy.SEMANTIC}
+
+_CHUNKERS = {
+    ChunkingStrategy.RECURSIVE: RecursiveChunker,
+    ChunkingStrategy.TOKEN: TokenChunker,
+    ChunkingStrategy.MARKDOWN: MarkdownChunker,
+    ChunkingStrategy.PARENT_CHILD: ParentChildChunker,
+}
+
+
+class DocumentResult(BaseModel):
+    """Output of the per-document worker stage."""
+    file_path: str
+    document_name: str
+    pages: int = 0
+    num_sections: int = 0
+    sections: List[DocumentSection] = Field(default_factory=list)  # only for parent-chunked strategies
+    chunks: List[DocumentChunk] = Field(default_factory=list)
+
+
+# Per-process components, created lazily inside each worker
+_worker_components = None
+_chunkers = {}
+
+
+def _get_worker_components():
+    global _worker_components
+    if _worker_components is None:
+        _worker_components = (PDFLoader(), TextPreprocessor(), StructureDetector())
+    return _worker_components
+
+
+def _get_chunker(strategy: ChunkingStrategy):
+    if strategy not in _chunkers:
+        _chunkers[strategy] = _CHUNKERS[strategy]()
+    return _chunkers[strategy]
+
+
+def process_document(file_path: str, strategy: str) -> DocumentResult:
+    """Worker stage: parse, clean, detect structure and (usually) chunk one PDF."""
+    loader, preprocessor, detector = _get_worker_components()
+    strategy = ChunkingStrategy(strategy)
+    document_name = os.path.basename(file_path)
+
+    # Pages stream through cleaning and structure detection; only sections are kept
+    page_count = [0]
+
+    def counted(pages):
+        for page in pages:
+            page_count[0] += 1
+            yield page
+
+    pages = preprocessor.iter_process(counted(loader.iter_pages(file_path, strategy)))
+    sections = detector.detect_sections(pages)
+    result = DocumentResult(
+        file_path=file_path, document_name=document_name,
+        pages=page_count[0], num_sections=len(sections),
+    )
+
+    if strategy in PARENT_CHUNKED:
+        result.sections = sections
+    elif sections:
+        # All sections belong to this one document
+        result.chunks = _get_chunker(strategy).chunk(sections, document_name)
+    return result
@@ -3,7 +3,9 @@ Text Preprocessor — Cleans and normalizes extracted PDF text,
 preserving formatting cues as Markdown.
 """
 import re
-from typing import List, Dict, Any
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
 
 from backend.utils.datatypes import DocumentPage
 from backend.utils.logger import logger
@@ -14,24 +16,24 @@ class TextPreprocessor:
 
     def process(self, pages: List[DocumentPage]) -> List[DocumentPage]:
         """Process a list of pages, returning cleaned versions."""
-        processed = []
+        return list(self.iter_process(pages))
+
+    def iter_process(self, pages: Iterable[DocumentPage]) -> Iterator[DocumentPage]:
+        """Clean pages lazily; each page's span array is dropped once it is formatted."""
         for page in pages:
             cleaned_text = self._clean_text(page.text)
             formatted_text = self._apply_formatting(
-                cleaned_text, page.metadata.get("formatting_spans", [])
+                cleaned_text, page.text, page.metadata.get("formatting_spans")
             )
-            processed.append(
-                DocumentPage(
-                    page_number=page.page_number,
-                    text=formatted_text,
-                    metadata={
-                        k: v
-                        for k, v in page.metadata.items()
-                        if k != "formatting_spans"
-                    },
-                )
+            yield DocumentPage(
+                page_number=page.page_number,
+                text=formatted_text,
+                metadata={
+                    k: v
+                    for k, v in page.metadata.items()
+                    if k != "formatting_spans"
+                },
             )
-        return processed
 
     def _clean_text(self, text: str) -> str:
         """Remove noise and normalize whitespace."""
@@ -48,24 +50,24 @@ class TextPreprocessor:
         return text.strip()
 
     def _apply_formatting(
-        self, text: str, spans: List[Dict[str, Any]]
+        self, text: str, raw_text: str, spans: Optional[np.ndarray]
     ) -> str:
-        """Convert formatting spans into Markdown annotations."""
-        if not spans:
+        """Convert formatting spans (offsets into raw_text) into Markdown annotations."""
+        if spans is None or not len(spans):
             return text
 
-        lines = text.split("\n")
+        levels = iter(self._line_heading_levels(raw_text, spans))
         formatted_lines = []
-        heading_sizes = self._detect_heading_sizes(spans)
 
-        for line in lines:
+        # Cleaning drops blank lines but keeps every other raw line, in order, so
+        # the k-th non-blank cleaned line is the k-th visible raw line
+        for line in text.split("\n"):
             stripped = line.strip()
             if not stripped:
                 formatted_lines.append("")
                 continue
 
-            # Check if the line content corresponds to a heading-sized span
-            level = self._get_heading_level(stripped, spans, heading_sizes)
+            level = next(levels, 0)
             if level > 0:
                 prefix = "#" * level
                 formatted_lines.append(f"{prefix} {stripped}")
@@ -74,27 +76,58 @@ class TextPreprocessor:
 
         return "\n".join(formatted_lines)
 
-    def _detect_heading_sizes(self, spans: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Identify distinct font sizes used as headings."""
-        sizes = set()
-        for span in spans:
-            if span.get("bold") and len(span.get("text", "").strip()) > 0:
-                sizes.add(span["size"])
+    def _line_heading_levels(self, raw_text: str, spans: np.ndarray) -> np.ndarray:
+        """
+        Heading level (0 = body) of each visible raw line, in one merged pass:
+        spans are assigned to lines by their start offset, and a line takes the
+        level of its first bold, non-blank span at a heading size.
+        """
+        codes = np.frombuffer(raw_text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        # Prefix counts of non-whitespace / of characters surviving _clean_text
+        classes = _CHAR_CLASS[np.minimum(codes, len(_CHAR_CLASS) - 1)]
+        non_space = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(classes != _SPACE, out=non_space[1:])
+        visible = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(classes == _TEXT, out=visible[1:])
+
+        line_starts = np.concatenate(([0], np.flatnonzero(codes == 10) + 1))
+        line_ends = np.append(line_starts[1:] - 1, len(codes))
+        visible_lines = visible[line_ends] > visible[line_starts]
+
+        starts = spans["start"].astype(np.int64)
+        nonblank = non_space[spans["end"]] > non_space[starts]
+        size_keys = np.round(spans["size"].astype(np.float64), 1)
+        heading_sizes = self._detect_heading_sizes(size_keys[spans["bold"] & nonblank])
 
-        sorted_sizes = sorted(sizes, reverse=True)
+        span_levels = np.zeros(len(spans), dtype=np.int64)
+        for size, level in heading_sizes.items():
+            span_levels[size_keys == size] = level
+        # Spans that disappear in cleaning (e.g. control characters) cannot mark a line
+        survives = visible[spans["end"]] > visible[starts]
+        span_levels[~(spans["bold"] & survives)] = 0
+
+        line_levels = np.zeros(len(line_starts), dtype=np.int64)
+        qualifying = np.flatnonzero(span_levels > 0)
+        if len(qualifying):
+            span_lines = np.searchsorted(line_starts, starts[qualifying], side="right") - 1
+            lines, first = np.unique(span_lines, return_index=True)
+            line_levels[lines] = span_levels[qualifying[first]]
+
+        return line_levels[visible_lines]
+
+    def _detect_heading_sizes(self, bold_sizes: np.ndarray) -> Dict[float, int]:
+        """Identify distinct font sizes used as headings (largest three bold sizes)."""
+        sorted_sizes = np.unique(bold_sizes)[::-1]
         mapping = {}
         for i, size in enumerate(sorted_sizes[:3]):
-            mapping[str(size)] = i + 1  # h1, h2, h3
+            mapping[float(size)] = i + 1  # h1, h2, h3
         return mapping
 
-    def _get_heading_level(
-        self, line_text: str, spans: List[Dict[str, Any]], heading_sizes: Dict[str, int]
-    ) -> int:
-        """Check if a line text matches a bold span at a heading size."""
-        for span in spans:
-            span_text = span.get("text", "").strip()
-            if span_text and span_text in line_text and span.get("bold"):
-                size_key = str(span.get("size", 0))
-                if size_key in heading_sizes:
-                    return heading_sizes[size_key]
-        return 0
+
+# Character classes by code point: text, whitespace (str.isspace) and control
+# characters removed by _clean_text. No whitespace lies above U+3000, so every
+# higher code point shares the final (text) slot.
+_TEXT, _SPACE, _CONTROL = 0, 1, 2
+_CHAR_CLASS = np.zeros(0x3000 + 2, dtype=np.uint8)
+_CHAR_CLASS[[*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F]] = _CONTROL
+_CHAR_CLASS[[c for c in range(0x3000 + 1) if chr(c).isspace()]] = _SPACE
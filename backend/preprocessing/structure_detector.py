@@ -3,7 +3,7 @@ Document Structure Detector — Identifies headings, lists, and paragraphs
 from preprocessed Markdown-like text.
 """
 import re
-from typing import List
+from typing import Iterable, List
 
 from backend.utils.datatypes import DocumentPage, DocumentSection
 from backend.utils.logger import logger
@@ -12,80 +12,85 @@ from backend.utils.logger import logger
 class StructureDetector:
     """Detect document structure: headings, lists, paragraphs, and section boundaries."""
 
-    def detect_sections(self, pages: List[DocumentPage]) -> List[DocumentSection]:
-        """Parse pages into structured sections."""
+    def detect_sections(self, pages: Iterable[DocumentPage]) -> List[DocumentSection]:
+        """
+        Parse pages into structured sections tagged with their document and page span.
+        Pages are consumed one at a time, so a generator of pages is never materialized.
+        """
         all_sections = []
+        fallback = []
+        num_pages = 0
 
         for page in pages:
+            num_pages += 1
             sections = self._parse_page(page)
             all_sections.extend(sections)
-
-        if not all_sections:
-            for page in pages:
-                all_sections.append(
+            if not sections:
+                fallback.append(
                     DocumentSection(
                         title="Content",
                         content=page.text,
                         level=1,
                         page_number=page.page_number,
+                        document_name=page.metadata.get("document_name", "unknown"),
+                        start_char=0,
+                        end_char=len(page.text),
                     )
                 )
 
-        logger.info(f"Detected {len(all_sections)} sections across {len(pages)} pages")
+        if not all_sections:
+            all_sections = fallback
+
+        logger.info(f"Detected {len(all_sections)} sections across {num_pages} pages")
         return all_sections
 
     def _parse_page(self, page: DocumentPage) -> List[DocumentSection]:
         """Parse a single page into sections based on headings."""
         sections = []
-        lines = page.text.split("\n")
+        text = page.text
         doc_name = page.metadata.get("document_name", "unknown")
 
         current_title = ""
         current_level = 1
-        current_content_lines = []
+        content_start = 0  # offset of the first line after the current heading
+
+        def flush(content_end: int, default_title: str):
+            # Strip the raw span so that content == text[start:end]
+            raw = text[content_start:content_end]
+            start = content_start + (len(raw) - len(raw.lstrip()))
+            end = max(start, content_start + len(raw.rstrip()))
+            if start < end or current_title:
+                sections.append(
+                    DocumentSection(
+                        title=current_title or default_title,
+                        content=text[start:end],
+                        level=current_level,
+                        page_number=page.page_number,
+                        document_name=doc_name,
+                        start_char=start,
+                        end_char=end,
+                    )
+                )
 
-        for line in lines:
+        offset = 0
+        for line in text.split("\n"):
+            line_end = offset + len(line)
             heading_match = re.match(r"^(#{1,6})\s+(.+)$", line)
 
             if heading_match:
                 # Flush previous section
-                if current_content_lines or current_title:
-                    content = "\n".join(current_content_lines).strip()
-                    if content or current_title:
-                        sections.append(
-                            DocumentSection(
-                                title=current_title or "Untitled",
-                                content=content,
-                                level=current_level,
-                                page_number=page.page_number,
-                            )
-                        )
+                if content_start < offset or current_title:
+                    flush(max(content_start, offset - 1), "Untitled")
 
                 # Start new section
                 current_level = len(heading_match.group(1))
                 current_title = heading_match.group(2).strip()
-                current_content_lines = []
-            else:
-                current_content_lines.append(line)
+                content_start = min(line_end + 1, len(text))
+
+            offset = line_end + 1
 
         # Flush final section
-        content = "\n".join(current_content_lines).strip()
-        if content or current_title:
-            sections.append(
-                DocumentSection(
-                    title=current_title or "Content",
-                    content=content,
-                    level=current_level,
-                    page_number=page.page_number,
-                )
-            )
-
-        # Annotate section metadata
-        for section in sections:
-            section_meta = {
-                "document_name": doc_name,
-                "page_number": page.page_number,
-            }
+        flush(len(text), "Content")
 
         return sections
 
@@ -0,0 +1,212 @@
+"""
+Answer Cache — serves repeated questions without retrieval or generation.
+
+Two tiers: an exact tier keyed on the normalized question, and a semantic tier
+that maps a near-duplicate question (query-embedding cosine similarity at or
+above a threshold) onto an exact-tier entry. Embedding similarity alone cannot
+tell "ibuprofen dose for children" from "... for adults", so a semantic match
+must also have the same set of analyzed BM25 query terms. Entries are tied to the vector
+store generation, so any ingestion that changes the store empties the cache.
+Streamed answers keep their token sequence so they can be replayed as SSE.
+"""
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from backend.embeddings.embeddings import EmbeddingEngine
+from backend.retrieval.bm25_retriever import tokenize
+from backend.utils.cache import LRUCache
+from backend.utils.config import CONFIG
+from backend.utils.logger import logger
+from backend.vectorstore.chroma_store import ChromaStore
+
+
+class CachedAnswer(BaseModel):
+    answer: str
+    citations: List[Dict[str, Any]] = Field(default_factory=list)
+    retrieval_method: str = ""
+    context_tokens: int = 0
+    tokens: List[str] = Field(default_factory=list)  # streamed tokens, for SSE replay
+
+
+class AnswerCache:
+    """Exact + embedding-similarity cache of final answers, invalidated on store writes."""
+
+    def __init__(
+        self,
+        embedder: EmbeddingEngine,
+        store: ChromaStore,
+        maxsize: int = None,
+        similarity: float = None,
+        ttl: float = None,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+    ):
+        self.embedder = embedder
+        self.store = store
+        maxsize = CONFIG.retrieval.answer_cache_size if maxsize is None else maxsize
+        self.similarity = (
+            CONFIG.retrieval.answer_cache_similarity if similarity is None else similarity
+        )
+        self.tokenizer = tokenizer
+        self._exact = LRUCache(
+            maxsize=maxsize,
+            ttl=CONFIG.retrieval.answer_cache_ttl if ttl is None else ttl,
+            on_evict=self._forget,
+        )
+        # Semantic tier: ring buffer of question embeddings (+ query terms) -> exact-tier key
+        self._vectors = np.zeros((max(maxsize, 0), embedder.dimension), dtype=np.float32)
+        self._keys: List[Optional[str]] = [None] * max(maxsize, 0)
+        self._terms: List[Optional[FrozenSet[str]]] = [None] * max(maxsize, 0)
+        self._next = 0
+        self._generation: Optional[int] = None
+        # Reentrant: an exact-tier put under the lock can evict, which calls _forget
+        self._lock = threading.RLock()
+        # One hit or miss per lookup, whichever tier answered
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._exact.enabled
+
+    @property
+    def generation(self) -> int:
+        """
+        Store generation the cache currently reflects. Read it before computing
+        an answer and pass it to `put`, so an answer computed across a store
+        write is not cached as current.
+        """
+        return self._check_generation()
+
+    def get(self, question: str) -> Optional[CachedAnswer]:
+        """Cached answer for the question or a near-duplicate of it, else None."""
+        if not self.enabled:
+            return None
+        self._check_generation()
+
+        key = self._normalize(question)
+        entry = self._exact.get(key, record=False)
+        if entry is not None:
+            logger.info("Answer cache: exact hit")
+            return self._record(entry)
+
+        if self.similarity <= 0 or self.similarity > 1:
+            return self._record(None)
+        terms = self._query_terms(question)
+        vector = self.embedder.embed_queries_array([question])[0]
+        # Most similar first; candidates whose terms differ or whose entry is gone are skipped
+        for match, score in self._candidates(vector, terms):
+            entry = self._exact.get(match, record=False)
+            if entry is None:
+                self._forget(match)
+                continue
+            self.semantic_hits += 1
+            logger.info(f"Answer cache: semantic hit ({score:.3f}) on '{match}'")
+            return self._record(entry)
+        return self._record(None)
+
+    def put(self, question: str, entry: CachedAnswer, generation: Optional[int] = None):
+        """Cache an answer; skipped when it was computed at an older `generation`."""
+        if not self.enabled:
+            return
+        current = self._check_generation()
+        if generation is not None and generation != current:
+            logger.info("Answer cache: store changed while answering, not caching")
+            return
+        key = self._normalize(question)
+        terms = self._query_terms(question)
+        vector = (
+            self.embedder.embed_queries_array([question])[0] if 0 < self.similarity <= 1 else None
+        )
+        with self._lock:
+            # Re-checked under the lock so a concurrent clear cannot be undone
+            if generation is not None and generation != self._generation:
+                return
+            self._exact.put(key, entry)
+            if vector is not None:
+                self._drop_slots(key)
+                self._vectors[self._next] = vector
+                self._keys[self._next] = key
+                self._terms[self._next] = terms
+                self._next = (self._next + 1) % len(self._keys)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._exact.clear()
+        self._vectors[:] = 0.0
+        self._keys = [None] * len(self._keys)
+        self._terms = [None] * len(self._terms)
+        self._next = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            **self._exact.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "semantic_hits": self.semantic_hits,
+        }
+
+    def _record(self, entry: Optional[CachedAnswer]) -> Optional[CachedAnswer]:
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def _candidates(self, vector: np.ndarray, terms: FrozenSet[str]) -> List[Tuple[str, float]]:
+        """Keys of cached questions at or above the similarity threshold with the same terms."""
+        with self._lock:
+            filled = [
+                i for i, key in enumerate(self._keys)
+                if key is not None and self._terms[i] == terms
+            ]
+            if not filled:
+                return []
+            # Embeddings are L2-normalized, so the dot product is the cosine
+            scores = self._vectors[filled] @ vector
+            order = np.argsort(-scores)
+            return [
+                (self._keys[filled[i]], float(scores[i]))
+                for i in order
+                if scores[i] >= self.similarity
+            ]
+
+    def _forget(self, key: Hashable, _entry: Any = None):
+        """Drop the semantic-tier slots of an exact-tier entry that was evicted or expired."""
+        with self._lock:
+            self._drop_slots(key)
+
+    def _drop_slots(self, key: Hashable):
+        for i, slot_key in enumerate(self._keys):
+            if slot_key == key:
+                self._keys[i] = None
+                self._terms[i] = None
+
+    def _query_terms(self, question: str) -> FrozenSet[str]:
+        return frozenset(self.tokenizer(question))
+
+    def _check_generation(self) -> int:
+        """Drop everything once the store has been written to since the cache filled."""
+        with self._lock:
+            generation = self.store.generation
+            if generation != self._generation:
+                if self._generation is not None:
+                    logger.info(
+                        f"Answer cache: store generation {self._generation} -> {generation}, clearing"
+                    )
+                self._clear()
+                self._generation = generation
+            return generation
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.lower().split()).rstrip("?.! ")
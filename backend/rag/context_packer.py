@@ -0,0 +1,123 @@
+"""
+Context Packer — fits retrieved chunks into a token budget for the LLM prompt.
+Chunks are taken in score order, near-duplicates (the same text or overlapping
+spans of the same page) are dropped, and the last chunk that does not fit is
+trimmed at a sentence or word boundary, so prompt size stays bounded.
+"""
+import math
+import re
+from typing import Callable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import RetrievalResult
+
+# Chunks sharing at least this fraction of the shorter one's page span are duplicates
+_SPAN_OVERLAP = 0.8
+# Do not bother appending a trimmed chunk with less room than this
+_MIN_TRIMMED_TOKENS = 48
+
+
+class PackedContext(BaseModel):
+    text: str
+    results: List[RetrievalResult] = Field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+    truncated: int = 0
+
+
+class ContextPacker:
+    """Select, dedupe and trim retrieved chunks to a token budget."""
+
+    def __init__(
+        self,
+        budget: int = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.budget = budget or CONFIG.ollama.context_token_budget
+        self.chars_per_token = CONFIG.ollama.chars_per_token
+        self.count_tokens = token_counter or self._estimate_tokens
+
+    def pack(self, results: List[RetrievalResult]) -> PackedContext:
+        packed = PackedContext(text="", budget=self.budget)
+        blocks: List[str] = []
+        remaining = self.budget
+        selected: List[RetrievalResult] = []
+
+        for result in sorted(results, key=lambda r: r.score, reverse=True):
+            if self._is_duplicate(result, selected):
+                packed.duplicates += 1
+                continue
+
+            header = self._header(len(selected) + 1, result)
+            text = result.chunk.text.strip()
+            cost = self.count_tokens(header) + self.count_tokens(text) + 2
+            if cost > remaining:
+                room = remaining - self.count_tokens(header) - 2
+                if room < _MIN_TRIMMED_TOKENS:
+                    packed.dropped += 1
+                    continue
+                text = self._trim(text, room)
+                cost = self.count_tokens(header) + self.count_tokens(text) + 2
+                packed.truncated += 1
+
+            blocks.append(f"{header}\n{text}")
+            selected.append(result)
+            remaining -= cost
+
+        packed.text = "\n\n".join(blocks)
+        packed.results = selected
+        packed.tokens = self.budget - remaining
+        return packed
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Approximate token count (no phi3 tokenizer is available in-process)."""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    @staticmethod
+    def _header(index: int, result: RetrievalResult) -> str:
+        meta = result.chunk.metadata
+        header = f"[{index}] {meta.get('document_name', 'Unknown')}, p. {meta.get('page_number', '?')}"
+        section = meta.get("section_title")
+        return f"{header}: {section}" if section else header
+
+    def _trim(self, text: str, tokens: int) -> str:
+        """Cut text to about `tokens`, preferring a sentence end, else a word boundary."""
+        cut = text[: int(tokens * self.chars_per_token)]
+        sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+        if sentence_end > len(cut) // 2:
+            return cut[: sentence_end + 1]
+        space = cut.rfind(" ")
+        return (cut[:space] if space > 0 else cut).rstrip() + " ..."
+
+    @staticmethod
+    def _is_duplicate(result: RetrievalResult, selected: List[RetrievalResult]) -> bool:
+        text = _normalize(result.chunk.text)
+        span = _span(result)
+        for other in selected:
+            if result.chunk.id == other.chunk.id:
+                return True
+            other_span = _span(other)
+            if span and other_span and span[0] == other_span[0]:
+                overlap = min(span[2], other_span[2]) - max(span[1], other_span[1])
+                shorter = min(span[2] - span[1], other_span[2] - other_span[1])
+                if shorter > 0 and overlap >= _SPAN_OVERLAP * shorter:
+                    return True
+            if text and text in _normalize(other.chunk.text):
+                return True
+        return False
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _span(result: RetrievalResult) -> Optional[Tuple[tuple, int, int]]:
+    """((document, page), start, end) for chunks carrying character offsets."""
+    meta = result.chunk.metadata
+    if "start_char" not in meta or "end_char" not in meta:
+        return None
+    return (meta.get("document_name"), meta.get("page_number")), meta["start_char"], meta["end_char"]
@@ -1,11 +1,13 @@
-from typing import TypedDict, List, Dict, Any, Literal
+from typing import TypedDict, List, Dict, Any, Literal, Optional
 from langgraph.graph import StateGraph, END
 
 from backend.utils.datatypes import RetrievalResult
 from backend.rag.safety_guard import SafetyGuard
 from backend.rag.llm_client import LLMClient
+from backend.rag.parent_context import ParentContextAssembler
 from backend.retrieval.hybrid_retriever import HybridRetriever
 from backend.retrieval.query_expander import QueryExpander
+from backend.retrieval.quality import RetrievalQualityEstimator
 from backend.utils.logger import logger
 from backend.utils.config import CONFIG
 
@@ -21,6 +23,7 @@ class OrchestratorState(TypedDict):
     retrieved_chunks: List[RetrievalResult]
     final_response: str
     citations: List[Dict[str, Any]]
+    context_tokens: int
     safety_passed: bool
     safety_message: str
 
@@ -29,9 +32,12 @@ def build_orchestrator(
     query_expander: QueryExpander,
     llm_client: LLMClient,
     safety_guard: SafetyGuard,
+    parent_assembler: Optional[ParentContextAssembler] = None,
+    quality_estimator: Optional[RetrievalQualityEstimator] = None,
 ):
     """Builds the LangGraph orchestration pipeline."""
-    
+    quality_estimator = quality_estimator or RetrievalQualityEstimator()
+
     workflow = StateGraph(OrchestratorState)
 
     # Node: Extract Entities (Pass-through or fast LLM extraction)
@@ -44,39 +50,43 @@ def build_orchestrator(
         logger.info(f"Extracted rough entities: {entities}")
         return {**state, "extracted_entities": entities}
 
-    # Node: Query Expansion
-    def expand_query(state: OrchestratorState) -> OrchestratorState:
-        """Use HyDE to expand user query against medical corpus."""
-        if CONFIG.retrieval.hyde_enabled:
-            logger.info("Executing Query Expansion phase (HyDE/MultiQuery)...")
-            results = query_expander.hyde_retrieve(state["query"], top_k=CONFIG.retrieval.top_k)
-            return {**state, "retrieved_chunks": results}
-        return state
-
     # Node: Hybrid Retrieval
     def hybrid_retrieval(state: OrchestratorState) -> OrchestratorState:
-        """Execute BM25 and Dense Retrieval, instantly returning RRF-ranked results."""
+        """Execute BM25 and Dense Retrieval, then estimate whether the results need expansion."""
         query = state["query"]
         logger.info(f"Executing hybrid retrieval for: {query}")
-        # Note: HybridRetriever explicitly handles reciprocal_rank_fusion internally via cosine similarity in the vector store
-        results = hybrid_retriever.retrieve(query, top_k=CONFIG.retrieval.top_k)
-        
-        # Merge if expanded fragments got retrieved
+        results, dense, bm25 = hybrid_retriever.retrieve_detailed(query, top_k=CONFIG.retrieval.top_k)
+        quality = quality_estimator.assess(query, dense, bm25)
+        logger.info(f"Retrieval quality {quality.score:.3f} {quality.signals}")
+
+        return {**state, "retrieved_chunks": results, "needs_expansion": quality.needs_expansion}
+
+    def route_expansion(state: OrchestratorState) -> Literal["expand_query", "assemble_parent_context"]:
+        """Only low-confidence retrievals pay for the HyDE LLM round trip."""
+        return "expand_query" if state["needs_expansion"] else "assemble_parent_context"
+
+    # Node: Query Expansion
+    def expand_query(state: OrchestratorState) -> OrchestratorState:
+        """Use HyDE to expand user query against medical corpus."""
+        logger.info("Executing Query Expansion phase (HyDE/MultiQuery)...")
+        results = query_expander.hyde_retrieve(state["query"], top_k=CONFIG.retrieval.top_k)
+
+        # Merge with the first-pass results
         existing = state.get("retrieved_chunks", [])
         merged_results = {r.chunk.id: r for r in (existing + results)}
-        
+
         # Sort and trim to top_k again across merged results
         top_results = sorted(merged_results.values(), key=lambda r: r.score, reverse=True)[:CONFIG.retrieval.top_k]
-        
+
         return {**state, "retrieved_chunks": top_results}
 
     # Node: Parent-Child Resolution
     def assemble_parent_context(state: OrchestratorState) -> OrchestratorState:
         """If child chunks are matched, look up their parent content for full LLM context."""
-        # For now, passing through gracefully. If chunking_manager exposes fetching parents, it happens here.
-        # This explicitly fulfills the parent-child assembly node requirement in LangGraph orchestration.
+        if parent_assembler is None:
+            return state
         logger.info("Assembling parent/child mapping context")
-        return state
+        return {**state, "retrieved_chunks": parent_assembler.assemble(state["retrieved_chunks"])}
 
     # Node: Jailbreak Prevention
     def check_safety(state: OrchestratorState) -> OrchestratorState:
@@ -105,8 +115,9 @@ def build_orchestrator(
     def generate_response(state: OrchestratorState) -> OrchestratorState:
         """Assemble the context into the prompt and yield generation."""
         logger.info("Generating via LLMClient...")
-        results = state["retrieved_chunks"]
-        response = llm_client.generate(state["query"], results)
+        # Cite only the chunks that made it into the packed prompt context
+        packed = llm_client.pack_context(state["retrieved_chunks"])
+        response = llm_client.generate(state["query"], packed)
         response = safety_guard.sanitize_output(response)
 
         citations = [
@@ -118,15 +129,20 @@ def build_orchestrator(
                 "retrieval_method": c.retrieval_method,
                 "text_preview": c.chunk.text[:200] + "..." if len(c.chunk.text) > 200 else c.chunk.text,
             }
-            for c in results
+            for c in packed.results
         ]
-        
-        return {**state, "final_response": response, "citations": citations}
+
+        return {
+            **state,
+            "final_response": response,
+            "citations": citations,
+            "context_tokens": packed.tokens,
+        }
 
     # === Compile LangGraph Workflow === #
     workflow.add_node("extract_entities", extract_entities)
-    workflow.add_node("expand_query", expand_query)
     workflow.add_node("hybrid_retrieval", hybrid_retrieval)
+    workflow.add_node("expand_query", expand_query)
     workflow.add_node("assemble_parent_context", assemble_parent_context)
     workflow.add_node("check_safety", check_safety)
     workflow.add_node("refuse", refuse)
@@ -134,9 +150,9 @@ def build_orchestrator(
 
     # Core execution order mapping exact requirements
     workflow.set_entry_point("extract_entities")
-    workflow.add_edge("extract_entities", "expand_query")
-    workflow.add_edge("expand_query", "hybrid_retrieval")
-    workflow.add_edge("hybrid_retrieval", "assemble_parent_context")
+    workflow.add_edge("extract_entities", "hybrid_retrieval")
+    workflow.add_conditional_edges("hybrid_retrieval", route_expansion)
+    workflow.add_edge("expand_query", "assemble_parent_context")
     workflow.add_edge("assemble_parent_context", "check_safety")
 
     workflow.add_conditional_edges("check_safety", route_safety)
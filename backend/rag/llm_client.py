@@ -1,14 +1,15 @@
 """
 LLM Client — Phi-3 Mini (3.8B) via Ollama with streaming support.
+Every call has a blocking and an asyncio (a-prefixed) variant.
 """
 import json
-from typing import Generator, List, Dict, Any
-
-import requests
+from typing import AsyncGenerator, Generator, List, Dict, Any, Optional, Union
 
+from backend.rag.context_packer import ContextPacker, PackedContext
 from backend.utils.datatypes import RetrievalResult
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
+from backend.utils.ollama_client import OllamaClient
 
 
 SYSTEM_PROMPT = """You are a medical information assistant.
@@ -26,36 +27,48 @@ Rules:
 
 Return ONLY the answer text."""
 
+# Prefixes of the messages returned/yielded in place of an answer when Ollama fails
+GENERATION_ERROR = "Error: Unable to generate response."
+STREAM_ERROR = "\n[Error: "
+
+
+def is_generation_error(text: str) -> bool:
+    return text.startswith(GENERATION_ERROR) or STREAM_ERROR in text
+
+
+# Generation accepts an already packed context or raw results (packed on the fly)
+Context = Union[PackedContext, List[RetrievalResult]]
+
 
 class LLMClient:
     """Phi-3 Mini LLM client via Ollama with streaming and RAG prompt assembly."""
 
-    def __init__(self):
-        self.base_url = CONFIG.ollama.base_url
+    def __init__(self, ollama_client: Optional[OllamaClient] = None):
+        self.ollama = ollama_client or OllamaClient()
+        self.base_url = self.ollama.base_url
         self.model = CONFIG.ollama.model
         self.temperature = CONFIG.ollama.temperature
         self.top_p = CONFIG.ollama.top_p
         self.max_tokens = CONFIG.ollama.max_tokens
-
-    def build_rag_prompt(
-        self, query: str, results: List[RetrievalResult]
-    ) -> str:
-        """Build a RAG prompt with context and citations."""
-        context_blocks = []
-        for i, result in enumerate(results, 1):
-            doc = result.chunk.metadata.get("document_name", "Unknown")
-            page = result.chunk.metadata.get("page_number", "?")
-            section = result.chunk.metadata.get("section_title", "General")
-            method = result.retrieval_method
-            score = f"{result.score:.3f}"
-
-            context_blocks.append(
-                f"[Source {i}] Document: {doc} | Page: {page} | Section: {section} | "
-                f"Retrieval: {method} | Relevance: {score}\n"
-                f"{result.chunk.text}"
-            )
-
-        context_str = "\n\n---\n\n".join(context_blocks)
+        self.context_packer = ContextPacker()
+
+    def pack_context(self, results: List[RetrievalResult]) -> PackedContext:
+        """
+        Pack results into the context token budget. Pack once per query and pass
+        the result to generation, citations and confidence, so they all describe
+        exactly the chunks the LLM sees.
+        """
+        packed = self.context_packer.pack(results)
+        logger.info(
+            f"Prompt context: {len(packed.results)}/{len(results)} chunks, "
+            f"~{packed.tokens}/{packed.budget} tokens ({packed.duplicates} duplicate, "
+            f"{packed.truncated} truncated, {packed.dropped} dropped)"
+        )
+        return packed
+
+    def build_rag_prompt(self, query: str, context: Context) -> str:
+        """Build a RAG prompt whose context is packed into the configured token budget."""
+        context_str = self._packed(context).text
 
         prompt = f"""{SYSTEM_PROMPT}
 
@@ -68,6 +81,9 @@ USER QUESTION:
 ANSWER:"""
         return prompt
 
+    def _packed(self, context: Context) -> PackedContext:
+        return context if isinstance(context, PackedContext) else self.pack_context(context)
+
     def _calculate_confidence_and_sources(self, results: List[RetrievalResult]) -> str:
         """Calculate confidence score and extract unique sources."""
         if not results:
@@ -88,88 +104,107 @@ ANSWER:"""
         sources_str = "\n".join(sources)
         return ""
 
-    def generate(self, query: str, results: List[RetrievalResult]) -> str:
+    def generate(self, query: str, context: Context) -> str:
         """Generate a complete response (non-streaming)."""
-        prompt = self.build_rag_prompt(query, results)
+        prompt = self.build_rag_prompt(query, context)
 
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": self.temperature,
-                        "top_p": self.top_p,
-                        "num_predict": self.max_tokens,
-                    },
-                },
-                timeout=120,
-            )
-            response.raise_for_status()
-            base_answer = response.json().get("response", "")
-            return base_answer
+            data = self.ollama.generate(self.model, prompt, self._options())
+            self._log_prompt_tokens(data)
+            return data.get("response", "")
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
-            return f"Error: Unable to generate response. {e}"
+            return f"{GENERATION_ERROR} {e}"
 
     def generate_stream(
-        self, query: str, results: List[RetrievalResult]
+        self, query: str, context: Context
     ) -> Generator[str, None, None]:
         """Stream response tokens for real-time display."""
-        prompt = self.build_rag_prompt(query, results)
+        prompt = self.build_rag_prompt(query, context)
 
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": True,
-                    "options": {
-                        "temperature": self.temperature,
-                        "top_p": self.top_p,
-                        "num_predict": self.max_tokens,
-                    },
-                },
-                stream=True,
-                timeout=120,
-            )
-            response.raise_for_status()
-
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line)
-                        token = chunk.get("response", "")
-                        if token:
-                            yield token
-                    except json.JSONDecodeError:
-                        continue
+            # Closing the response hands the connection back to the pool, even
+            # when the consumer stops reading early
+            with self.ollama.generate_stream(self.model, prompt, self._options()) as response:
+                for line in response.iter_lines():
+                    token = self._stream_token(line)
+                    if token:
+                        yield token
+
+        except Exception as e:
+            logger.error(f"LLM streaming failed: {e}")
+            yield f"{STREAM_ERROR}{e}]"
+
+    async def agenerate(self, query: str, context: Context) -> str:
+        """Async `generate`: awaits Ollama without holding a thread."""
+        prompt = self.build_rag_prompt(query, context)
+
+        try:
+            data = await self.ollama.agenerate(self.model, prompt, self._options())
+            self._log_prompt_tokens(data)
+            return data.get("response", "")
+        except Exception as e:
+            logger.error(f"LLM generation failed: {e}")
+            return f"{GENERATION_ERROR} {e}"
+
+    async def agenerate_stream(
+        self, query: str, context: Context
+    ) -> AsyncGenerator[str, None]:
+        """Async `generate_stream`."""
+        prompt = self.build_rag_prompt(query, context)
+
+        try:
+            response = await self.ollama.agenerate_stream(self.model, prompt, self._options())
+            try:
+                async for line in response.aiter_lines():
+                    token = self._stream_token(line)
+                    if token:
+                        yield token
+            finally:
+                await response.aclose()
 
         except Exception as e:
             logger.error(f"LLM streaming failed: {e}")
-            yield f"\n[Error: {e}]"
+            yield f"{STREAM_ERROR}{e}]"
+
+    def _stream_token(self, line) -> str:
+        """Token of one NDJSON stream line ("" for blank or malformed lines)."""
+        if not line:
+            return ""
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            return ""
+        if chunk.get("done"):
+            self._log_prompt_tokens(chunk)
+        return chunk.get("response", "")
+
+    def _options(self) -> Dict[str, Any]:
+        return {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "num_predict": self.max_tokens,
+        }
+
+    @staticmethod
+    def _log_prompt_tokens(data: Dict[str, Any]):
+        """Log the prompt size Ollama actually evaluated (absent when the prompt was cached)."""
+        if "prompt_eval_count" in data:
+            logger.info(
+                f"Prompt eval: {data['prompt_eval_count']} tokens in "
+                f"{data.get('prompt_eval_duration', 0) / 1e9:.2f}s"
+            )
 
     def raw_generate(self, prompt: str, max_tokens: int = 200) -> str:
         """Raw generation without RAG template (for HyDE/MultiQuery)."""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": max_tokens,
-                    },
-                },
+            data = self.ollama.generate(
+                self.model,
+                prompt,
+                {"temperature": 0.3, "num_predict": max_tokens},
                 timeout=30,
             )
-            response.raise_for_status()
-            return response.json().get("response", "")
+            return data.get("response", "")
         except Exception as e:
             logger.error(f"Raw LLM call failed: {e}")
             return ""
@@ -177,13 +212,19 @@ ANSWER:"""
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information from Ollama."""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/show",
-                json={"name": self.model},
-                timeout=10,
-            )
-            response.raise_for_status()
-            data = response.json()
+            return self._model_info(self.ollama.show(self.model))
+        except Exception:
+            return self._model_info(None)
+
+    async def aget_model_info(self) -> Dict[str, Any]:
+        try:
+            return self._model_info(await self.ollama.ashow(self.model))
+        except Exception:
+            return self._model_info(None)
+
+    def _model_info(self, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Format an /api/show response (None when Ollama could not be reached)."""
+        if data is not None:
             return {
                 "model": self.model,
                 "family": data.get("details", {}).get("family", "unknown"),
@@ -191,11 +232,11 @@ ANSWER:"""
                 "quantization": data.get("details", {}).get("quantization_level", "unknown"),
                 "temperature": self.temperature,
                 "max_tokens": self.max_tokens,
+                "context_token_budget": self.context_packer.budget,
             }
-        except Exception:
-            return {
-                "model": self.model,
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "status": "unable to fetch details",
-            }
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "status": "unable to fetch details",
+        }
@@ -0,0 +1,123 @@
+"""
+Parent Context Assembler — resolves retrieved child chunks to their parent
+chunks so the LLM sees the surrounding context, not just the matched snippet.
+
+All parents of a result set are fetched in one batched lookup (hot parents
+come from an in-memory LRU), and children sharing a parent collapse into a
+single result ranked at its best child. The LRU is emptied whenever the
+store generation moves, so re-ingested parents are never served stale.
+"""
+import threading
+from typing import Dict, List, Optional
+
+from backend.utils.cache import LRUCache
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import DocumentChunk, RetrievalResult
+from backend.utils.logger import logger
+from backend.vectorstore.chroma_store import ChromaStore
+
+# Cache marker for parent ids that are not in the store
+_NO_PARENT = object()
+
+
+class ParentContextAssembler:
+    """Replace child chunks with their (deduplicated) parent chunks."""
+
+    def __init__(self, store: ChromaStore, cache_size: int = None):
+        self.store = store
+        self.enabled = CONFIG.retrieval.parent_context_enabled
+        self._cache = LRUCache(
+            maxsize=CONFIG.retrieval.parent_cache_size if cache_size is None else cache_size
+        )
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def assemble(self, results: List[RetrievalResult]) -> List[RetrievalResult]:
+        """
+        Map ranked child results to parent results. Results without a parent
+        (other chunking strategies) or whose parent is missing pass through.
+        """
+        if not self.enabled:
+            return results
+
+        parent_ids = [self._parent_id(r.chunk) for r in results]
+        wanted = [pid for pid in dict.fromkeys(parent_ids) if pid]
+        if not wanted:
+            return results
+
+        parents = self._get_parents(wanted)
+
+        assembled: List[RetrievalResult] = []
+        position: Dict[str, int] = {}  # parent_id -> index in assembled
+        for result, parent_id in zip(results, parent_ids):
+            parent = parents.get(parent_id) if parent_id else None
+            if parent is None:
+                assembled.append(result)
+                continue
+            if parent_id in position:
+                # A higher-ranked sibling already brought this parent in
+                assembled[position[parent_id]].chunk.metadata["child_ids"].append(result.chunk.id)
+                continue
+
+            position[parent_id] = len(assembled)
+            assembled.append(
+                RetrievalResult(
+                    chunk=DocumentChunk(
+                        id=parent.id,
+                        text=parent.text,
+                        metadata={**parent.metadata, "child_ids": [result.chunk.id]},
+                    ),
+                    score=result.score,
+                    retrieval_method=result.retrieval_method,
+                )
+            )
+
+        logger.info(
+            f"Parent context: {len(results)} results -> {len(assembled)} "
+            f"({len(position)} parents)"
+        )
+        return assembled
+
+    def _get_parents(self, parent_ids: List[str]) -> Dict[str, DocumentChunk]:
+        """Parents by id: cache hits first, then one batched store lookup for the rest."""
+        generation = self._check_generation()
+        found = {}
+        missing = []
+        for parent_id in parent_ids:
+            parent = self._cache.get(parent_id)
+            if parent is None:
+                missing.append(parent_id)
+            elif parent is not _NO_PARENT:
+                found[parent_id] = parent
+
+        if missing:
+            fetched = {parent.id: parent for parent in self.store.get_parent_chunks(missing)}
+            with self._lock:
+                # Skip caching when the store was written to while fetching
+                if generation == self.store.generation == self._generation:
+                    for parent_id in missing:
+                        # Unknown ids are cached too, so they do not cost a lookup on every query
+                        self._cache.put(parent_id, fetched.get(parent_id, _NO_PARENT))
+            found.update(fetched)
+        return found
+
+    def _check_generation(self) -> int:
+        """Drop cached parents and misses once the store has been written to."""
+        with self._lock:
+            generation = self.store.generation
+            if generation != self._generation:
+                if self._generation is not None:
+                    logger.info(
+                        f"Parent cache: store generation {self._generation} -> {generation}, clearing"
+                    )
+                self._cache.clear()
+                self._generation = generation
+        return generation
+
+    @staticmethod
+    def _parent_id(chunk: DocumentChunk) -> Optional[str]:
+        # Chunks hydrated from the store carry parent_id in metadata only
+        return chunk.parent_id or chunk.metadata.get("parent_id")
+
+    def cache_stats(self):
+        return self._cache.stats()
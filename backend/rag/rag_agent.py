@@ -2,20 +2,83 @@
 RAG Agent — LangGraph state-machine agent for document intelligence.
 Orchestrates: safety_check → classify → retrieve → [expand] → generate.
 """
-from typing import TypedDict, List, Dict, Any, Annotated, Literal
+from typing import TypedDict, List, Dict, Any, Annotated, Literal, Optional, Tuple
+import asyncio
+import functools
 import operator
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from langgraph.graph import StateGraph, END
 
 from backend.utils.datatypes import RetrievalResult, QueryState
-from backend.rag.llm_client import LLMClient
+from backend.rag.answer_cache import AnswerCache, CachedAnswer
+from backend.rag.llm_client import LLMClient, is_generation_error
+from backend.rag.parent_context import ParentContextAssembler
 from backend.rag.safety_guard import SafetyGuard
 from backend.retrieval.hybrid_retriever import HybridRetriever
 from backend.retrieval.query_expander import QueryExpander
+from backend.retrieval.quality import RetrievalQualityEstimator
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
 
 
+def build_citations(results: List[RetrievalResult]) -> List[Dict[str, Any]]:
+    """Citation payloads for the results handed to the LLM."""
+    return [
+        {
+            "document": r.chunk.metadata.get("document_name", "Unknown"),
+            "page": r.chunk.metadata.get("page_number", 0),
+            "section": r.chunk.metadata.get("section_title", ""),
+            "score": round(r.score, 4),
+            "retrieval_method": r.retrieval_method,
+            "text_preview": r.chunk.text[:200] + "..." if len(r.chunk.text) > 200 else r.chunk.text,
+        }
+        for r in results
+    ]
+
+
+def first_pass_retrieve(
+    hybrid_retriever: HybridRetriever,
+    query_expander: QueryExpander,
+    quality_estimator: RetrievalQualityEstimator,
+    question: str,
+    executor: Optional[Executor] = None,
+) -> Tuple[List[RetrievalResult], bool, Optional[str]]:
+    """
+    Hybrid retrieval plus the expansion decision. With speculative HyDE the
+    hypothetical passage is generated on `executor` while retrieval runs, and is
+    cancelled if the first pass turns out confident.
+    Returns (results, needs_expansion, hypothetical or None if not generated).
+    """
+    top_k = CONFIG.retrieval.top_k
+    speculate = (
+        executor is not None
+        and CONFIG.retrieval.hyde_enabled
+        and CONFIG.retrieval.speculative_hyde
+    )
+    cancel = threading.Event()
+    future = executor.submit(query_expander.generate_hypothetical, question, cancel) if speculate else None
+
+    try:
+        results, dense, bm25 = hybrid_retriever.retrieve_detailed(question, top_k=top_k)
+    except Exception:
+        cancel.set()
+        raise
+
+    expand = quality_estimator.assess(question, dense, bm25).needs_expansion
+    hypothetical = None
+    if future is not None:
+        if expand:
+            hypothetical = future.result()
+            logger.info("Speculative HyDE: passage used for expansion")
+        else:
+            cancel.set()
+            future.cancel()
+            logger.info("Speculative HyDE: first pass confident, cancelled")
+    return results, expand, hypothetical
+
+
 class AgentState(TypedDict):
     query: str
     expanded_queries: List[str]
@@ -26,6 +89,8 @@ class AgentState(TypedDict):
     safety_message: str
     needs_expansion: bool
     retrieval_method: str
+    hypothetical: Optional[str]
+    context_tokens: int
 
 
 def build_rag_agent(
@@ -33,8 +98,12 @@ def build_rag_agent(
     query_expander: QueryExpander,
     llm_client: LLMClient,
     safety_guard: SafetyGuard,
+    parent_assembler: Optional[ParentContextAssembler] = None,
+    executor: Optional[Executor] = None,
+    quality_estimator: Optional[RetrievalQualityEstimator] = None,
 ):
     """Build and return a compiled LangGraph RAG agent."""
+    quality_estimator = quality_estimator or RetrievalQualityEstimator()
 
     def safety_check(state: AgentState) -> AgentState:
         """Validate the input query for safety."""
@@ -60,17 +129,10 @@ def build_rag_agent(
         }
 
     def retrieve(state: AgentState) -> AgentState:
-        """Run hybrid retrieval."""
-        results = hybrid_retriever.retrieve(state["query"], top_k=CONFIG.retrieval.top_k)
-
-        # Check if retrieval quality is sufficient
-        needs_expansion = False
-        if results:
-            avg_score = sum(r.score for r in results) / len(results)
-            if avg_score < 0.01:  # RRF scores are typically small
-                needs_expansion = True
-        else:
-            needs_expansion = True
+        """Run hybrid retrieval (speculatively generating the HyDE passage alongside)."""
+        results, expand, hypothetical = first_pass_retrieve(
+            hybrid_retriever, query_expander, quality_estimator, state["query"], executor
+        )
 
         chunks_data = [
             {
@@ -86,20 +148,23 @@ def build_rag_agent(
         return {
             **state,
             "retrieved_chunks": chunks_data,
-            "needs_expansion": needs_expansion,
+            "needs_expansion": expand,
             "retrieval_method": "hybrid",
+            "hypothetical": hypothetical,
         }
 
     def should_expand(state: AgentState) -> Literal["expand", "generate"]:
-        """Decide if query expansion is needed."""
-        if state["needs_expansion"] and CONFIG.retrieval.hyde_enabled:
+        """Decide if query expansion is needed (the estimator already honours hyde_enabled)."""
+        if state["needs_expansion"]:
             return "expand"
         return "generate"
 
     def expand_query(state: AgentState) -> AgentState:
         """Expand query using HyDE or MultiQuery."""
         logger.info("Expanding query with HyDE...")
-        results = query_expander.hyde_retrieve(state["query"], top_k=CONFIG.retrieval.top_k)
+        results = query_expander.hyde_retrieve(
+            state["query"], top_k=CONFIG.retrieval.top_k, hypothetical=state.get("hypothetical")
+        )
 
         chunks_data = [
             {
@@ -132,26 +197,22 @@ def build_rag_agent(
             )
             for c in state["retrieved_chunks"]
         ]
+        if parent_assembler is not None:
+            # Hand the LLM each matched child's parent section (one batched lookup)
+            results = parent_assembler.assemble(results)
 
-        response = llm_client.generate(state["query"], results)
+        # Citations describe the packed context, i.e. only what the LLM saw
+        packed = llm_client.pack_context(results)
+        response = llm_client.generate(state["query"], packed)
         response = safety_guard.sanitize_output(response)
 
-        citations = [
-            {
-                "document": c["metadata"].get("document_name", "Unknown"),
-                "page": c["metadata"].get("page_number", 0),
-                "section": c["metadata"].get("section_title", ""),
-                "score": round(c["score"], 4),
-                "retrieval_method": c.get("retrieval_method", ""),
-                "text_preview": c["text"][:200] + "..." if len(c["text"]) > 200 else c["text"],
-            }
-            for c in state["retrieved_chunks"]
-        ]
+        citations = build_citations(packed.results)
 
         return {
             **state,
             "response": response,
             "citations": citations,
+            "context_tokens": packed.tokens,
         }
 
     # Build the graph
@@ -193,17 +254,42 @@ class RAGAgent:
         hybrid_retriever: HybridRetriever,
         query_expander: QueryExpander,
         llm_client: LLMClient,
+        parent_assembler: Optional[ParentContextAssembler] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        quality_estimator: Optional[RetrievalQualityEstimator] = None,
     ):
         self.llm_client = llm_client
+        self.answer_cache = answer_cache
+        self.quality_estimator = quality_estimator or RetrievalQualityEstimator()
         self.safety_guard = SafetyGuard()
         self.hybrid_retriever = hybrid_retriever
         self.query_expander = query_expander
+        self.parent_assembler = parent_assembler
+        # Bounded pool for the blocking retrieval work of the async query path
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=CONFIG.retrieval.query_workers,
+            thread_name_prefix="rag-query",
+        )
         self.agent = build_rag_agent(
-            hybrid_retriever, query_expander, llm_client, self.safety_guard
+            hybrid_retriever,
+            query_expander,
+            llm_client,
+            self.safety_guard,
+            parent_assembler,
+            executor=self._executor,
+            quality_estimator=self.quality_estimator,
         )
 
     def query(self, question: str) -> Dict[str, Any]:
         """Run a query through the full agent pipeline."""
+        # Unsafe questions go through the graph to its refusal node
+        generation = None
+        if self.safety_guard.check(question)[0]:
+            cached, generation = self._cached_answer(question)
+            if cached is not None:
+                return self._cached_result(cached)
+
         initial_state: AgentState = {
             "query": question,
             "expanded_queries": [],
@@ -214,52 +300,243 @@ class RAGAgent:
             "safety_message": "",
             "needs_expansion": False,
             "retrieval_method": "",
+            "hypothetical": None,
+            "context_tokens": 0,
         }
 
         result = self.agent.invoke(initial_state)
 
+        if result.get("safety_passed", True):
+            self._remember(
+                question,
+                result.get("response", ""),
+                result.get("citations", []),
+                result.get("retrieval_method", ""),
+                result.get("context_tokens", 0),
+                generation=generation,
+            )
         return {
             "answer": result.get("response", ""),
             "citations": result.get("citations", []),
             "safety_passed": result.get("safety_passed", True),
             "retrieval_method": result.get("retrieval_method", ""),
+            "context_tokens": result.get("context_tokens", 0),
         }
 
     def query_stream(self, question: str):
         """
         Run safety + retrieval, then stream the generation.
-        Returns (citations, generator) or (citations, error_string).
+        Returns (citations, generator, context_tokens) or
+        (citations, error_string, 0).
         """
         is_safe, message = self.safety_guard.check(question)
         if not is_safe:
-            return [], message
-
-        # Retrieve
-        results = self.hybrid_retriever.retrieve(question, top_k=CONFIG.retrieval.top_k)
+            return [], message, 0
+
+        cached, generation = self._cached_answer(question)
+        if cached is not None:
+            return cached.citations, iter(cached.tokens), cached.context_tokens
+
+        # Retrieve, and expand with HyDE if the first pass is weak
+        results, expand, hypothetical = first_pass_retrieve(
+            self.hybrid_retriever,
+            self.query_expander,
+            self.quality_estimator,
+            question,
+            self._executor,
+        )
+        retrieval_method = "hybrid"
+        if expand:
+            logger.info("Low retrieval scores, expanding with HyDE...")
+            results = self.query_expander.hyde_retrieve(
+                question, top_k=CONFIG.retrieval.top_k, hypothetical=hypothetical
+            )
+            retrieval_method = "hyde"
 
-        # Check if expansion needed
-        if results:
-            avg_score = sum(r.score for r in results) / len(results)
-            if avg_score < 0.01 and CONFIG.retrieval.hyde_enabled:
-                logger.info("Low retrieval scores, expanding with HyDE...")
-                results = self.query_expander.hyde_retrieve(question, top_k=CONFIG.retrieval.top_k)
+        if self.parent_assembler is not None:
+            results = self.parent_assembler.assemble(results)
 
-        citations = [
-            {
-                "document": r.chunk.metadata.get("document_name", "Unknown"),
-                "page": r.chunk.metadata.get("page_number", 0),
-                "section": r.chunk.metadata.get("section_title", ""),
-                "score": round(r.score, 4),
-                "retrieval_method": r.retrieval_method,
-                "text_preview": r.chunk.text[:200] + "..." if len(r.chunk.text) > 200 else r.chunk.text,
-            }
-            for r in results
-        ]
+        packed = self.llm_client.pack_context(results)
+        citations = build_citations(packed.results)
 
         # Return streaming generator
         def stream():
-            for token in self.llm_client.generate_stream(question, results):
+            tokens = []
+            for token in self.llm_client.generate_stream(question, packed):
                 sanitized = self.safety_guard.sanitize_output(token)
+                tokens.append(sanitized)
                 yield sanitized
+            # Only reached when the client read the whole answer
+            self._remember(
+                question, "".join(tokens), citations, retrieval_method, packed.tokens, tokens,
+                generation=generation,
+            )
+
+        return citations, stream(), packed.tokens
 
-        return citations, stream()
+    async def aquery(self, question: str) -> Dict[str, Any]:
+        """
+        Async equivalent of `query` for the API: Ollama calls are awaited, and
+        the blocking embedding / BM25 / store work runs on a bounded thread pool,
+        so many queries can be in flight on one event loop.
+        """
+        is_safe, message = self.safety_guard.check(question)
+        if not is_safe:
+            return {
+                "answer": message,
+                "citations": [],
+                "safety_passed": False,
+                "retrieval_method": "",
+                "context_tokens": 0,
+            }
+
+        loop = asyncio.get_running_loop()
+        cached, generation = await loop.run_in_executor(
+            self._executor, self._cached_answer, question
+        )
+        if cached is not None:
+            return self._cached_result(cached)
+
+        results, retrieval_method = await self._aretrieve(question)
+        packed = self.llm_client.pack_context(results)
+        response = self.safety_guard.sanitize_output(
+            await self.llm_client.agenerate(question, packed)
+        )
+        citations = build_citations(packed.results)
+        await loop.run_in_executor(
+            self._executor,
+            functools.partial(
+                self._remember, question, response, citations, retrieval_method,
+                packed.tokens, generation=generation,
+            ),
+        )
+
+        return {
+            "answer": response,
+            "citations": citations,
+            "safety_passed": True,
+            "retrieval_method": retrieval_method,
+            "context_tokens": packed.tokens,
+        }
+
+    async def aquery_stream(self, question: str):
+        """
+        Async equivalent of `query_stream`.
+        Returns (citations, async generator, context_tokens) or
+        (citations, error_string, 0).
+        """
+        is_safe, message = self.safety_guard.check(question)
+        if not is_safe:
+            return [], message, 0
+
+        loop = asyncio.get_running_loop()
+        cached, generation = await loop.run_in_executor(
+            self._executor, self._cached_answer, question
+        )
+        if cached is not None:
+            async def replay():
+                for token in cached.tokens:
+                    yield token
+            return cached.citations, replay(), cached.context_tokens
+
+        results, retrieval_method = await self._aretrieve(question)
+        packed = self.llm_client.pack_context(results)
+        citations = build_citations(packed.results)
+
+        async def stream():
+            tokens = []
+            async for token in self.llm_client.agenerate_stream(question, packed):
+                sanitized = self.safety_guard.sanitize_output(token)
+                tokens.append(sanitized)
+                yield sanitized
+            await loop.run_in_executor(
+                self._executor,
+                functools.partial(
+                    self._remember, question, "".join(tokens), citations, retrieval_method,
+                    packed.tokens, tokens, generation=generation,
+                ),
+            )
+
+        return citations, stream(), packed.tokens
+
+    async def _aretrieve(self, question: str) -> Tuple[List[RetrievalResult], str]:
+        """
+        Hybrid retrieval, HyDE when it is weak, then parent resolution. With
+        speculative HyDE the passage is requested while retrieval runs and the
+        request is cancelled (aborting it in Ollama) when it is not needed.
+        """
+        loop = asyncio.get_running_loop()
+        top_k = CONFIG.retrieval.top_k
+        hyde_task = None
+        if CONFIG.retrieval.hyde_enabled and CONFIG.retrieval.speculative_hyde:
+            hyde_task = asyncio.ensure_future(self.query_expander.agenerate_hypothetical(question))
+
+        try:
+            results, dense, bm25 = await loop.run_in_executor(
+                self._executor, self.hybrid_retriever.retrieve_detailed, question, top_k
+            )
+        except BaseException:
+            if hyde_task is not None:
+                hyde_task.cancel()
+            raise
+        retrieval_method = "hybrid"
+
+        if self.quality_estimator.assess(question, dense, bm25).needs_expansion:
+            logger.info("Low retrieval scores, expanding with HyDE...")
+            hypothetical = await hyde_task if hyde_task is not None else None
+            results = await self.query_expander.ahyde_retrieve(
+                question, top_k=top_k, executor=self._executor, hypothetical=hypothetical
+            )
+            retrieval_method = "hyde"
+        elif hyde_task is not None:
+            hyde_task.cancel()
+            logger.info("Speculative HyDE: first pass confident, cancelled")
+
+        if self.parent_assembler is not None:
+            results = await loop.run_in_executor(
+                self._executor, self.parent_assembler.assemble, results
+            )
+        return results, retrieval_method
+
+    def _cached_answer(self, question: str) -> Tuple[Optional[CachedAnswer], Optional[int]]:
+        """Cached answer (or None) and the store generation a fresh answer would be computed at."""
+        if self.answer_cache is None:
+            return None, None
+        generation = self.answer_cache.generation
+        return self.answer_cache.get(question), generation
+
+    def _remember(
+        self,
+        question: str,
+        answer: str,
+        citations: List[Dict[str, Any]],
+        retrieval_method: str,
+        context_tokens: int = 0,
+        tokens: Optional[List[str]] = None,
+        generation: Optional[int] = None,
+    ):
+        """Cache a completed answer (failed generations are not cached)."""
+        if self.answer_cache is None or not answer or is_generation_error(answer):
+            return
+        self.answer_cache.put(
+            question,
+            CachedAnswer(
+                answer=answer,
+                citations=citations,
+                retrieval_method=retrieval_method,
+                context_tokens=context_tokens,
+                tokens=tokens or [answer],
+            ),
+            generation=generation,
+        )
+
+    @staticmethod
+    def _cached_result(cached: CachedAnswer) -> Dict[str, Any]:
+        return {
+            "answer": cached.answer,
+            "citations": cached.citations,
+            "safety_passed": True,
+            "retrieval_method": cached.retrieval_method,
+            "context_tokens": cached.context_tokens,
+            "cached": True,
+        }
@@ -0,0 +1,506 @@
+"""
+BM25 Index — inverted index with incrementally maintained statistics.
+Documents can be added and deleted in batches without rebuilding the corpus.
+
+Postings are NumPy arrays (term -> sorted doc slots / term frequencies), so a
+query only touches the posting lists of its own terms. Top-k search uses
+MaxScore: once the k-th best partial score exceeds the summed upper bounds of
+the remaining terms, those terms are only evaluated for existing candidates.
+
+The index can be saved to a single versioned file and loaded back with the
+posting arrays memory-mapped, so process start does not re-tokenize the corpus.
+Every document also carries an opaque payload (the retriever stores the
+chunk text and metadata there), so hits are hydrated from the same mapped
+file without a vector-store round trip. Each array carries its own CRC. Loading checks the header, the array bounds and
+the small arrays it reads anyway, and leaves the posting pages untouched until a
+query needs them.
+"""
+import json
+import os
+import struct
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from backend.utils.config import CONFIG
+
+# Compact tombstoned slots once they outnumber live documents (and this floor)
+_COMPACT_MIN_DEAD = 1024
+
+# On-disk layout: magic | <II version, header length> | JSON header | aligned arrays
+_FILE_MAGIC = b"BM25IDX\0"
+FORMAT_VERSION = 2
+_ALIGN = 64
+_ARRAYS = frozenset({
+    "post_offsets", "post_docs", "post_tfs", "term_stats",
+    "doc_lengths", "doc_term_offsets", "doc_terms", "payload_offsets", "payloads",
+})
+# Read in full by load() anyway, so their CRCs are checked there; the posting
+# document-term and payload arrays stay lazily mapped (bounds-checked only)
+_EAGER_ARRAYS = frozenset({
+    "post_offsets", "term_stats", "doc_lengths", "doc_term_offsets", "payload_offsets",
+})
+
+
+class BM25Index:
+    """Okapi BM25 over NumPy posting lists with MaxScore top-k pruning."""
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = k1 if k1 is not None else CONFIG.retrieval.bm25_k1
+        self.b = b if b is not None else CONFIG.retrieval.bm25_b
+
+        # Vocabulary and per-term postings (indexed by term id)
+        self._vocab: Dict[str, int] = {}
+        self._post_docs: List[np.ndarray] = []
+        self._post_tfs: List[np.ndarray] = []
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._df: List[int] = []
+        self._max_tf: List[int] = []
+        self._min_len: List[int] = []
+
+        # Per-document state (indexed by slot)
+        self._slots: Dict[str, int] = {}
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_terms: List[np.ndarray] = []
+        self._doc_payloads: List[Union[bytes, np.ndarray]] = []
+        self._doc_lengths = np.zeros(0, dtype=np.float64)
+        self._live = np.zeros(0, dtype=bool)
+        self._total_length = 0
+        self._num_dead = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    @property
+    def avg_doc_length(self) -> float:
+        return self._total_length / len(self._slots) if self._slots else 0.0
+
+    def add(self, doc_id: str, tokens: List[str], payload: bytes = b""):
+        """Index a tokenized document (and its payload), replacing any previous version of it."""
+        if doc_id in self._slots:
+            self.delete(doc_id)
+
+        slot = len(self._doc_ids)
+        self._ensure_capacity(slot + 1)
+        doc_len = len(tokens)
+
+        term_ids = []
+        for term, tf in Counter(tokens).items():
+            tid = self._vocab.get(term)
+            if tid is None:
+                tid = self._new_term(term)
+            docs, tfs = self._pending.setdefault(tid, ([], []))
+            docs.append(slot)
+            tfs.append(tf)
+            self._df[tid] += 1
+            self._max_tf[tid] = max(self._max_tf[tid], tf)
+            self._min_len[tid] = min(self._min_len[tid], doc_len)
+            term_ids.append(tid)
+
+        self._slots[doc_id] = slot
+        self._doc_ids.append(doc_id)
+        self._doc_terms.append(np.asarray(term_ids, dtype=np.int32))
+        self._doc_payloads.append(payload)
+        self._doc_lengths[slot] = doc_len
+        self._live[slot] = True
+        self._total_length += doc_len
+
+    def delete(self, doc_id: str) -> bool:
+        """Tombstone a document. Returns False if it was not indexed."""
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+
+        for tid in self._doc_terms[slot]:
+            self._df[tid] -= 1
+
+        self._total_length -= int(self._doc_lengths[slot])
+        self._doc_ids[slot] = None
+        self._doc_terms[slot] = np.zeros(0, dtype=np.int32)
+        self._doc_payloads[slot] = b""
+        self._live[slot] = False
+        self._num_dead += 1
+
+        if self._num_dead > max(_COMPACT_MIN_DEAD, len(self._slots)):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Drop tombstoned slots from every posting list and renumber documents."""
+        n = len(self._doc_ids)
+        live = self._live[:n]
+        remap = np.cumsum(live, dtype=np.int64) - 1
+
+        for tid in range(len(self._post_docs)):
+            docs, tfs = self._posting(tid)
+            keep = live[docs]
+            docs, tfs = docs[keep], tfs[keep]
+            self._post_docs[tid] = remap[docs].astype(np.int32)
+            self._post_tfs[tid] = tfs
+            self._max_tf[tid] = int(tfs.max()) if len(tfs) else 0
+            self._min_len[tid] = (
+                int(self._doc_lengths[docs].min()) if len(docs) else np.iinfo(np.int32).max
+            )
+
+        self._doc_ids = [d for d in self._doc_ids if d is not None]
+        self._doc_terms = [t for t, alive in zip(self._doc_terms, live) if alive]
+        self._doc_payloads = [p for p, alive in zip(self._doc_payloads, live) if alive]
+        self._doc_lengths = self._doc_lengths[:n][live].copy()
+        self._live = np.ones(len(self._doc_ids), dtype=bool)
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(self._doc_ids)}
+        self._num_dead = 0
+
+    def save(self, path: str, generation: int):
+        """Write the index to `path` atomically, tagged with the store generation."""
+        self.compact()
+
+        post_offsets = np.zeros(len(self._post_docs) + 1, dtype=np.int64)
+        post_offsets[1:] = np.cumsum([len(d) for d in self._post_docs])
+        doc_term_offsets = np.zeros(len(self._doc_terms) + 1, dtype=np.int64)
+        doc_term_offsets[1:] = np.cumsum([len(t) for t in self._doc_terms])
+        payload_offsets = np.zeros(len(self._doc_payloads) + 1, dtype=np.int64)
+        payload_offsets[1:] = np.cumsum([len(p) for p in self._doc_payloads])
+
+        arrays = {
+            "post_offsets": post_offsets,
+            "post_docs": _concat(self._post_docs, np.int32),
+            "post_tfs": _concat(self._post_tfs, np.int32),
+            "term_stats": np.array(
+                [self._df, self._max_tf, self._min_len], dtype=np.int64
+            ).reshape(3, -1),
+            "doc_lengths": np.ascontiguousarray(self._doc_lengths[: len(self._doc_ids)]),
+            "doc_term_offsets": doc_term_offsets,
+            "doc_terms": _concat(self._doc_terms, np.int32),
+            "payload_offsets": payload_offsets,
+            "payloads": _concat(
+                [np.frombuffer(p, dtype=np.uint8) for p in self._doc_payloads], np.uint8
+            ),
+        }
+
+        table, offset = {}, 0
+        for name, arr in arrays.items():
+            offset = _aligned(offset)
+            table[name] = {
+                "dtype": arr.dtype.str,
+                "shape": list(arr.shape),
+                "offset": offset,
+                "crc": zlib.crc32(arr.data),
+            }
+            offset += arr.nbytes
+
+        vocab = [None] * len(self._vocab)
+        for term, tid in self._vocab.items():
+            vocab[tid] = term
+
+        header = json.dumps({
+            "generation": generation,
+            "num_docs": len(self._doc_ids),
+            "k1": self.k1,
+            "b": self.b,
+            "total_length": self._total_length,
+            "arrays": table,
+            "vocab": vocab,
+            "doc_ids": self._doc_ids,
+        }).encode("utf-8")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_FILE_MAGIC)
+            f.write(struct.pack("<II", FORMAT_VERSION, len(header)))
+            f.write(header)
+            data_start = _aligned(f.tell())
+            for name, arr in arrays.items():
+                f.write(b"\0" * (data_start + table[name]["offset"] - f.tell()))
+                f.write(arr.data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["BM25Index", Dict[str, Any]]:
+        """Load an index saved with `save`, memory-mapping its posting arrays.
+
+        Returns (index, header). Raises ValueError if the file is corrupt or
+        written by an incompatible format version.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+                raise ValueError("not a BM25 index file")
+            version, header_len = struct.unpack("<II", f.read(8))
+            if version != FORMAT_VERSION:
+                raise ValueError(f"unsupported BM25 index version {version}")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            data_start = _aligned(f.tell())
+            data_size = os.fstat(f.fileno()).st_size - data_start
+
+        specs = header["arrays"]
+        missing = _ARRAYS.difference(specs)
+        if missing:
+            raise ValueError(f"BM25 index is missing arrays: {sorted(missing)}")
+        for name, spec in specs.items():
+            end = spec["offset"] + int(np.prod(spec["shape"])) * np.dtype(spec["dtype"]).itemsize
+            if spec["offset"] < 0 or end > data_size:
+                raise ValueError(f"BM25 index array {name} is out of bounds (truncated file?)")
+
+        data = (
+            np.memmap(path, dtype=np.uint8, mode="r", offset=data_start)
+            if data_size else np.zeros(0, dtype=np.uint8)
+        )
+
+        def array(name: str) -> np.ndarray:
+            spec = specs[name]
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            start = spec["offset"]
+            arr = data[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+            if name in _EAGER_ARRAYS and zlib.crc32(arr.data) != spec["crc"]:
+                raise ValueError(f"BM25 index checksum mismatch in {name}")
+            return arr
+
+        index = cls(k1=header["k1"], b=header["b"])
+        post_offsets = array("post_offsets")
+        post_docs, post_tfs = array("post_docs"), array("post_tfs")
+        doc_term_offsets, doc_terms = array("doc_term_offsets"), array("doc_terms")
+        num_terms, num_docs = len(header["vocab"]), len(header["doc_ids"])
+        _check_offsets("post_offsets", post_offsets, num_terms, len(post_docs))
+        _check_offsets("doc_term_offsets", doc_term_offsets, num_docs, len(doc_terms))
+        payload_offsets, payloads = array("payload_offsets"), array("payloads")
+        _check_offsets("payload_offsets", payload_offsets, num_docs, len(payloads))
+        if len(post_tfs) != len(post_docs) or specs["term_stats"]["shape"] != [3, num_terms]:
+            raise ValueError("BM25 index term arrays disagree with the vocabulary")
+        if specs["doc_lengths"]["shape"] != [num_docs]:
+            raise ValueError("BM25 index document arrays disagree with the document ids")
+
+        index._vocab = {term: tid for tid, term in enumerate(header["vocab"])}
+        index._post_docs = [
+            post_docs[post_offsets[t]:post_offsets[t + 1]] for t in range(len(post_offsets) - 1)
+        ]
+        index._post_tfs = [
+            post_tfs[post_offsets[t]:post_offsets[t + 1]] for t in range(len(post_offsets) - 1)
+        ]
+        df, max_tf, min_len = array("term_stats")
+        index._df, index._max_tf, index._min_len = df.tolist(), max_tf.tolist(), min_len.tolist()
+
+        index._doc_ids = header["doc_ids"]
+        index._slots = {doc_id: slot for slot, doc_id in enumerate(index._doc_ids)}
+        index._doc_terms = [
+            doc_terms[doc_term_offsets[d]:doc_term_offsets[d + 1]]
+            for d in range(len(index._doc_ids))
+        ]
+        index._doc_payloads = [
+            payloads[payload_offsets[d]:payload_offsets[d + 1]]
+            for d in range(len(index._doc_ids))
+        ]
+        # Per-document arrays are small and mutated by add(), so keep them in memory
+        index._doc_lengths = np.array(array("doc_lengths"), dtype=np.float64)
+        index._live = np.ones(len(index._doc_ids), dtype=bool)
+        index._total_length = header["total_length"]
+        return index, header
+
+    def payloads(self, doc_ids: List[str]) -> Dict[str, bytes]:
+        """Stored payloads of the given (indexed) documents; only their pages are read."""
+        found = {}
+        for doc_id in doc_ids:
+            slot = self._slots.get(doc_id)
+            if slot is not None:
+                found[doc_id] = bytes(self._doc_payloads[slot])
+        return found
+
+    def search(self, query_tokens: List[str], top_k: int) -> List[Tuple[str, float]]:
+        """Return the top-k (doc_id, score) pairs using MaxScore pruning."""
+        if not self._slots or not query_tokens or top_k <= 0:
+            return []
+
+        terms = self._query_terms(query_tokens)
+        if not terms:
+            return []
+
+        avgdl = self.avg_doc_length or 1.0
+        weights = np.array([w for _, w in terms])
+        bounds = np.array([
+            w * self._max_tf[tid] / (self._max_tf[tid] + self._length_norm(self._min_len[tid], avgdl))
+            for tid, w in terms
+        ])
+
+        # Highest-impact terms first; remaining[i] bounds what terms i.. can still add
+        order = np.argsort(-bounds, kind="stable")
+        remaining = np.cumsum(bounds[order][::-1])[::-1]
+
+        cand_docs = np.zeros(0, dtype=np.int32)
+        cand_scores = np.zeros(0, dtype=np.float64)
+
+        for pos, i in enumerate(order):
+            tid, weight = terms[i][0], weights[i]
+
+            if len(cand_docs) >= top_k:
+                theta = np.partition(cand_scores, -top_k)[-top_k]
+                if remaining[pos] <= theta:
+                    # Unseen documents can no longer reach the top-k: only refine
+                    # candidates that might still beat the current threshold.
+                    keep = cand_scores + remaining[pos] >= theta
+                    cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+                    cand_scores += self._candidate_scores(tid, weight, cand_docs, avgdl)
+                    continue
+
+            docs, scores = self._term_scores(tid, weight, avgdl)
+            if not len(cand_docs):
+                cand_docs, cand_scores = docs, scores.astype(np.float64)
+                continue
+            merged, inverse = np.unique(
+                np.concatenate([cand_docs, docs]), return_inverse=True
+            )
+            cand_scores = np.bincount(
+                inverse, weights=np.concatenate([cand_scores, scores]), minlength=len(merged)
+            )
+            cand_docs = merged.astype(np.int32)
+
+        return self._top_k(cand_docs, cand_scores, top_k)
+
+    def search_batch(
+        self, queries_tokens: List[List[str]], top_k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Score several queries in one matrix pass.
+        Each distinct query term's posting list is scored once into a
+        (candidate docs x terms) matrix, which is multiplied by the
+        (terms x queries) weight matrix to get every query's scores.
+        """
+        if not self._slots or top_k <= 0:
+            return [[] for _ in queries_tokens]
+
+        per_query = [self._query_terms(tokens) for tokens in queries_tokens]
+        columns: Dict[int, int] = {}
+        for terms in per_query:
+            for tid, _ in terms:
+                columns.setdefault(tid, len(columns))
+        if not columns:
+            return [[] for _ in queries_tokens]
+
+        weights = np.zeros((len(columns), len(per_query)), dtype=np.float64)
+        for q, terms in enumerate(per_query):
+            for tid, w in terms:
+                weights[columns[tid], q] = w
+
+        avgdl = self.avg_doc_length or 1.0
+        docs_parts, score_parts, col_parts = [], [], []
+        for tid, col in columns.items():
+            docs, scores = self._term_scores(tid, 1.0, avgdl)
+            docs_parts.append(docs)
+            score_parts.append(scores)
+            col_parts.append(np.full(len(docs), col, dtype=np.int32))
+
+        cand_docs, rows = np.unique(np.concatenate(docs_parts), return_inverse=True)
+        tf_parts = np.zeros((len(cand_docs), len(columns)), dtype=np.float64)
+        tf_parts[rows, np.concatenate(col_parts)] = np.concatenate(score_parts)
+        scores = tf_parts @ weights
+
+        return [
+            self._top_k(cand_docs[scores[:, q] > 0], scores[scores[:, q] > 0, q], top_k)
+            for q in range(len(per_query))
+        ]
+
+    def _query_terms(self, query_tokens: List[str]) -> List[Tuple[int, float]]:
+        """Resolve query tokens to (term id, qtf * idf * (k1 + 1)) for indexed terms."""
+        n = len(self._slots)
+        terms = []
+        for term, qtf in Counter(query_tokens).items():
+            tid = self._vocab.get(term)
+            if tid is None or self._df[tid] <= 0:
+                continue
+            df = self._df[tid]
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            terms.append((tid, qtf * idf * (self.k1 + 1)))
+        return terms
+
+    def _length_norm(self, doc_lengths, avgdl: float):
+        return self.k1 * (1 - self.b + self.b * doc_lengths / avgdl)
+
+    def _term_scores(self, tid: int, weight: float, avgdl: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every live document in a term's posting list."""
+        docs, tfs = self._posting(tid)
+        mask = self._live[docs]
+        docs, tfs = docs[mask], tfs[mask]
+        scores = weight * tfs / (tfs + self._length_norm(self._doc_lengths[docs], avgdl))
+        return docs, scores
+
+    def _candidate_scores(
+        self, tid: int, weight: float, cand_docs: np.ndarray, avgdl: float
+    ) -> np.ndarray:
+        """Score a term only for the given (sorted) candidate documents."""
+        docs, tfs = self._posting(tid)
+        out = np.zeros(len(cand_docs), dtype=np.float64)
+        if not len(docs) or not len(cand_docs):
+            return out
+        idx = np.minimum(np.searchsorted(docs, cand_docs), len(docs) - 1)
+        hit = docs[idx] == cand_docs
+        tf = tfs[idx[hit]]
+        out[hit] = weight * tf / (tf + self._length_norm(self._doc_lengths[cand_docs[hit]], avgdl))
+        return out
+
+    def _top_k(
+        self, docs: np.ndarray, scores: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float]]:
+        if not len(docs):
+            return []
+        if len(docs) > top_k:
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            part = np.arange(len(docs))
+        # Highest score first; ties broken by slot so single and batch search agree
+        best = part[np.lexsort((docs[part], -scores[part]))]
+        return [(self._doc_ids[docs[i]], float(scores[i])) for i in best]
+
+    def _posting(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return a term's posting arrays, folding in any pending appends."""
+        pending = self._pending.pop(tid, None)
+        if pending is not None:
+            self._post_docs[tid] = np.concatenate(
+                [self._post_docs[tid], np.asarray(pending[0], dtype=np.int32)]
+            )
+            self._post_tfs[tid] = np.concatenate(
+                [self._post_tfs[tid], np.asarray(pending[1], dtype=np.int32)]
+            )
+        return self._post_docs[tid], self._post_tfs[tid]
+
+    def _new_term(self, term: str) -> int:
+        tid = len(self._post_docs)
+        self._vocab[term] = tid
+        self._post_docs.append(np.zeros(0, dtype=np.int32))
+        self._post_tfs.append(np.zeros(0, dtype=np.int32))
+        self._df.append(0)
+        self._max_tf.append(0)
+        self._min_len.append(np.iinfo(np.int32).max)
+        return tid
+
+    def _ensure_capacity(self, size: int):
+        if size <= len(self._live):
+            return
+        capacity = max(size, 2 * len(self._live), 256)
+        lengths = np.zeros(capacity, dtype=np.float64)
+        lengths[: len(self._doc_lengths)] = self._doc_lengths
+        live = np.zeros(capacity, dtype=bool)
+        live[: len(self._live)] = self._live
+        self._doc_lengths, self._live = lengths, live
+
+
+def _check_offsets(name: str, offsets: np.ndarray, count: int, total: int):
+    """Offsets into a concatenated array must start at 0, never decrease and end at its length."""
+    if (
+        len(offsets) != count + 1
+        or offsets[0] != 0
+        or offsets[-1] != total
+        or (count and np.any(np.diff(offsets) < 0))
+    ):
+        raise ValueError(f"BM25 index {name} are inconsistent")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _concat(arrays: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.zeros(0, dtype=dtype)
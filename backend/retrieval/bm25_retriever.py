@@ -1,77 +1,246 @@
 """
-BM25 Retriever — lexical/keyword search using rank_bm25.
+BM25 Retriever — lexical/keyword search over an incrementally maintained BM25 index.
+The index is persisted next to the Chroma collection and reloaded at startup.
+Each indexed chunk's text and metadata ride along as its index payload, so the
+BM25 leg returns full chunks without a ChromaDB lookup.
 """
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import json
+import os
 import re
-
-from rank_bm25 import BM25Okapi
+import threading
 
 from backend.utils.datatypes import DocumentChunk, RetrievalResult
 from backend.vectorstore.chroma_store import ChromaStore
+from backend.retrieval.bm25_index import BM25Index
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
 
+# Minimal stopword set for the drug domain
+_STOPWORDS = frozenset({
+    "the", "a", "an", "is", "are", "was", "were", "be", "been",
+    "being", "have", "has", "had", "do", "does", "did", "and",
+    "or", "but", "in", "on", "at", "to", "for", "of", "with",
+    "by", "it", "its", "this", "that", "from",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Simple whitespace tokenization with lowercasing and punctuation removal."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return [t for t in text.split() if t not in _STOPWORDS and len(t) > 1]
+
 
 class BM25Retriever:
     """BM25 lexical search over document chunks."""
 
-    def __init__(self, store: ChromaStore):
+    def __init__(self, store: ChromaStore, index_path: str = None):
         self.store = store
-        self._index: Optional[BM25Okapi] = None
-        self._chunks: List[DocumentChunk] = []
-        self._tokenized_corpus: List[List[str]] = []
+        self.index_path = index_path or os.path.join(
+            store.persist_directory, f"{store.collection_name}.bm25"
+        )
+        self._index = BM25Index()
+        self._built = False
+        self._dirty = False
+        # Store generation the in-memory index reflects
+        self._generation: Optional[int] = None
+        # Guards the index against concurrent queries and ingestion (hybrid legs run in threads)
+        self._lock = threading.RLock()
+
+    def ensure_index(self):
+        """
+        Load the persisted index if it is current, otherwise rebuild from the
+        store. Runs before every query: once the store generation moves past the
+        one the index reflects (another process ingested), the index is reloaded.
+        """
+        with self._lock:
+            if self._built:
+                generation = self.store.generation
+                if generation == self._generation:
+                    return
+                logger.info(
+                    f"BM25 index reflects generation {self._generation}, "
+                    f"store is at {generation}; reloading"
+                )
+            if not self.load_index():
+                self.build_index()
+
+    @contextmanager
+    def updating(self):
+        """
+        Hold the index while the caller writes to the store and mirrors those
+        writes here, so queries never see the store ahead of the index. Writes
+        that need no index change (e.g. parent chunks) are accounted for on exit.
+        """
+        with self._lock:
+            current = self._built and self.store.generation == self._generation
+            yield self
+            if current:
+                self._generation = self.store.generation
 
     def build_index(self):
         """Build the BM25 index from all chunks in the store."""
-        self._chunks = self.store.get_all_chunks()
-        if not self._chunks:
-            logger.warning("No chunks found for BM25 indexing")
+        with self._lock:
+            self.reset()
+            chunks = self.store.get_all_chunks()
+            if not chunks:
+                logger.warning("No chunks found for BM25 indexing")
+                return
+
+            self.add_chunks(chunks)
+            logger.info(f"BM25 index built with {len(self._index)} documents")
+            self.save_index()
+
+    def load_index(self) -> bool:
+        """Memory-map the on-disk index. Returns False if missing, unreadable or stale."""
+        if not CONFIG.retrieval.bm25_persist or not os.path.exists(self.index_path):
+            return False
+
+        try:
+            index, header = BM25Index.load(self.index_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable BM25 index {self.index_path}: {e}")
+            return False
+
+        generation = self.store.generation
+        if header["generation"] != generation or header["num_docs"] != self.store.count():
+            logger.info(
+                f"BM25 index on disk is stale (generation {header['generation']}, "
+                f"collection at {generation}); rebuilding"
+            )
+            return False
+
+        self._index = index
+        self._built = True
+        self._dirty = False
+        self._generation = generation
+        logger.info(f"BM25 index loaded from {self.index_path} ({len(index)} documents)")
+        return True
+
+    def save_index(self):
+        """Persist the index (no-op when persistence is disabled or the index is empty)."""
+        if not CONFIG.retrieval.bm25_persist or not self._built or not len(self._index):
+            return
+        try:
+            with self._lock:
+                self._index.save(self.index_path, generation=self._generation)
+                self._dirty = False
+            logger.info(f"BM25 index saved to {self.index_path}")
+        except OSError as e:
+            logger.error(f"Failed to save BM25 index: {e}")
+
+    def save_if_dirty(self):
+        """Persist incremental changes made since the last save."""
+        if self._dirty:
+            self.save_index()
+
+    def reset(self):
+        """Clear the index (e.g. after the underlying collection was deleted)."""
+        with self._lock:
+            self._index = BM25Index()
+            self._built = True
+            self._dirty = True
+            self._generation = self.store.generation
+
+    def add_chunks(self, chunks: List[DocumentChunk]):
+        """Index a batch of new chunks; cost is proportional to the batch, not the corpus."""
+        if not self._built:
+            # The lazy load/build on first query will pick these up from the store
             return
 
-        self._tokenized_corpus = [
-            self._tokenize(chunk.text) for chunk in self._chunks
+        tokenized = [
+            (chunk.id, self._tokenize(chunk.text), self._payload(chunk)) for chunk in chunks
         ]
-        self._index = BM25Okapi(self._tokenized_corpus)
-        logger.info(f"BM25 index built with {len(self._chunks)} documents")
+        with self._lock:
+            for chunk_id, tokens, payload in tokenized:
+                self._index.add(chunk_id, tokens, payload)
+            self._generation = self.store.generation
+            self._dirty = True
+
+        logger.info(f"BM25 index: added {len(chunks)} chunks ({len(self._index)} total)")
+
+    def delete_chunks(self, chunk_ids: List[str]):
+        """Remove a batch of chunks from the index."""
+        if not self._built:
+            return
+
+        with self._lock:
+            removed = sum(1 for chunk_id in chunk_ids if self._index.delete(chunk_id))
+            self._generation = self.store.generation
+            self._dirty = True
+
+        logger.info(f"BM25 index: removed {removed} chunks ({len(self._index)} total)")
 
     def retrieve(self, query: str, top_k: int = None) -> List[RetrievalResult]:
         """Retrieve top-k chunks using BM25 scoring."""
         top_k = top_k or CONFIG.retrieval.top_k
+        self.ensure_index()
+        tokenized_query = self._tokenize(query)
 
-        if self._index is None:
-            self.build_index()
-
-        if self._index is None or not self._chunks:
+        with self._lock:
+            hits = [
+                (cid, score)
+                for cid, score in self._index.search(tokenized_query, top_k)
+                if score > 0
+            ]
+            payloads = self._index.payloads([cid for cid, _ in hits])
+        if not hits:
             return []
 
-        tokenized_query = self._tokenize(query)
-        scores = self._index.get_scores(tokenized_query)
-
-        scored_indices = sorted(
-            range(len(scores)), key=lambda i: scores[i], reverse=True
-        )[:top_k]
-
-        results = []
-        for idx in scored_indices:
-            if scores[idx] > 0:
-                results.append(
-                    RetrievalResult(
-                        chunk=self._chunks[idx],
-                        score=float(scores[idx]),
-                        retrieval_method="bm25",
-                    )
-                )
+        chunks = self._hydrate(payloads)
+        return [
+            RetrievalResult(
+                chunk=chunks[chunk_id],
+                score=float(score),
+                retrieval_method="bm25",
+            )
+            for chunk_id, score in hits
+            if chunk_id in chunks
+        ]
+
+    def retrieve_batch(self, queries: List[str], top_k: int = None) -> List[List[RetrievalResult]]:
+        """Retrieve top-k chunks for several queries with one scoring pass and one store lookup."""
+        top_k = top_k or CONFIG.retrieval.top_k
+        self.ensure_index()
+        tokenized = [self._tokenize(query) for query in queries]
+
+        with self._lock:
+            hits = self._index.search_batch(tokenized, top_k)
+            payloads = self._index.payloads(
+                list(dict.fromkeys(cid for query_hits in hits for cid, _ in query_hits))
+            )
 
-        return results
+        chunks = self._hydrate(payloads)
+        return [
+            [
+                RetrievalResult(chunk=chunks[cid], score=float(score), retrieval_method="bm25")
+                for cid, score in query_hits
+                if cid in chunks
+            ]
+            for query_hits in hits
+        ]
+
+    @staticmethod
+    def _payload(chunk: DocumentChunk) -> bytes:
+        """Text and metadata exactly as the store returns them for this chunk."""
+        return json.dumps(
+            {"text": chunk.text, "metadata": ChromaStore.stored_metadata(chunk)}
+        ).encode("utf-8")
+
+    def _hydrate(self, payloads: Dict[str, bytes]) -> Dict[str, DocumentChunk]:
+        """Chunks for the hits from their payloads; ids without one fall back to the store."""
+        chunks = {}
+        for chunk_id, payload in payloads.items():
+            if payload:
+                data = json.loads(payload)
+                chunks[chunk_id] = DocumentChunk(
+                    id=chunk_id, text=data["text"], metadata=data["metadata"]
+                )
+        missing = [chunk_id for chunk_id in payloads if chunk_id not in chunks]
+        if missing:
+            chunks.update({c.id: c for c in self.store.get_chunks_by_ids(missing)})
+        return chunks
 
     def _tokenize(self, text: str) -> List[str]:
-        """Simple whitespace tokenization with lowercasing and punctuation removal."""
-        text = text.lower()
-        text = re.sub(r"[^\w\s]", " ", text)
-        tokens = text.split()
-        # Remove stopwords (minimal set for drug domain)
-        stopwords = {"the", "a", "an", "is", "are", "was", "were", "be", "been",
-                      "being", "have", "has", "had", "do", "does", "did", "and",
-                      "or", "but", "in", "on", "at", "to", "for", "of", "with",
-                      "by", "it", "its", "this", "that", "from"}
-        return [t for t in tokens if t not in stopwords and len(t) > 1]
+        return tokenize(text)
@@ -24,10 +24,24 @@ class DenseRetriever:
     ) -> List[RetrievalResult]:
         """Retrieve top-k similar chunks for a query."""
         top_k = top_k or CONFIG.retrieval.top_k
-        query_embedding = self.embedder.embed_text(query)
+        query_embedding = self.embedder.embed_queries_array([query])[0]
         results = self.store.search(query_embedding, top_k=top_k, where=filters)
 
         for r in results:
             r.retrieval_method = "dense"
 
         return results
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[RetrievalResult]]:
+        """Embed all queries in one encode call and search them in one store query."""
+        top_k = top_k or CONFIG.retrieval.top_k
+        if not queries:
+            return []
+        query_embeddings = self.embedder.embed_queries_array(queries)
+        # Results are already tagged retrieval_method="dense" by the store
+        return self.store.search_batch(query_embeddings, top_k=top_k, where=filters)
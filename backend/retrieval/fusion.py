@@ -0,0 +1,124 @@
+"""
+Score Fusion — combines ranked result lists into a single ranking.
+Methods: Reciprocal Rank Fusion (RRF), weighted RRF and a convex combination
+of per-list normalized scores (min-max or z-score).
+
+All lists are flattened into NumPy arrays of chunk ids, ranks and scores, so
+fusing thousands of candidates is a handful of vectorized operations.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.utils.datatypes import FusionMethod, RetrievalResult
+from backend.utils.config import CONFIG
+
+
+def _rrf(ranks: np.ndarray, scores: np.ndarray, segments: np.ndarray, rrf_k: int, normalization: str) -> np.ndarray:
+    return 1.0 / (rrf_k + ranks + 1)
+
+
+def _normalized(ranks: np.ndarray, scores: np.ndarray, segments: np.ndarray, rrf_k: int, normalization: str) -> np.ndarray:
+    """Normalize raw scores within each list (segments = start offset of each non-empty list)."""
+    counts = np.diff(np.append(segments, len(scores)))
+    if normalization == "zscore":
+        mean = np.add.reduceat(scores, segments) / counts
+        centered = scores - np.repeat(mean, counts)
+        std = np.sqrt(np.add.reduceat(centered ** 2, segments) / counts)
+        std = np.repeat(std, counts)
+        return np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+
+    low = np.repeat(np.minimum.reduceat(scores, segments), counts)
+    span = np.repeat(np.maximum.reduceat(scores, segments), counts) - low
+    # A list whose scores are all equal contributes fully for each of its items
+    return np.divide(scores - low, span, out=np.ones_like(scores), where=span > 0)
+
+
+# Per-entry contribution for each fusion method
+_CONTRIBUTIONS: Dict[FusionMethod, Callable[..., np.ndarray]] = {
+    FusionMethod.RRF: _rrf,
+    FusionMethod.WEIGHTED_RRF: _rrf,
+    FusionMethod.CONVEX: _normalized,
+}
+
+
+class ScoreFusion:
+    """Fuse multiple ranked result lists with a configurable method and per-list weights."""
+
+    def __init__(
+        self,
+        method: FusionMethod = None,
+        rrf_k: int = None,
+        normalization: str = None,
+    ):
+        self.method = FusionMethod(method or CONFIG.retrieval.fusion_method)
+        self.rrf_k = rrf_k or CONFIG.retrieval.rrf_k
+        self.normalization = normalization or CONFIG.retrieval.fusion_normalization
+
+    def fuse(
+        self,
+        result_lists: List[List[RetrievalResult]],
+        top_k: int,
+        weights: Optional[Sequence[float]] = None,
+        merge_methods: bool = True,
+    ) -> List[RetrievalResult]:
+        """
+        Fuse result lists and return the top-k.
+        `weights` apply to weighted RRF and convex combination (one per list,
+        default equal). With `merge_methods`, the fused retrieval_method joins
+        the methods of every list a chunk appeared in (e.g. "dense+bm25").
+        """
+        lengths = np.array([len(results) for results in result_lists], dtype=np.int64)
+        flat = [result for results in result_lists for result in results]
+        if not flat or top_k <= 0:
+            return []
+
+        ids = np.array([result.chunk.id for result in flat])
+        scores = np.array([result.score for result in flat], dtype=np.float64)
+        list_idx = np.repeat(np.arange(len(result_lists)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        ranks = np.arange(len(flat)) - np.repeat(starts, lengths)
+
+        contrib = _CONTRIBUTIONS[self.method](
+            ranks, scores, starts[lengths > 0], self.rrf_k, self.normalization
+        )
+        contrib = contrib * self._list_weights(weights, len(result_lists))[list_idx]
+
+        unique_ids, first_pos, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        fused = np.bincount(inverse, weights=contrib, minlength=len(unique_ids))
+
+        # Highest fused score first; ties keep first-seen order
+        if len(fused) > top_k:
+            selected = np.argpartition(-fused, top_k - 1)[:top_k]
+        else:
+            selected = np.arange(len(fused))
+        selected = selected[np.lexsort((first_pos[selected], -fused[selected]))]
+
+        methods: Dict[int, Dict[str, None]] = {int(u): {} for u in selected}
+        if merge_methods:
+            for pos in np.flatnonzero(np.isin(inverse, selected)):
+                methods[int(inverse[pos])][flat[pos].retrieval_method] = None
+
+        return [
+            RetrievalResult(
+                chunk=flat[first_pos[u]].chunk,
+                score=float(fused[u]),
+                retrieval_method=(
+                    "+".join(methods[int(u)]) if merge_methods
+                    else flat[first_pos[u]].retrieval_method
+                ),
+            )
+            for u in selected
+        ]
+
+    def _list_weights(self, weights: Optional[Sequence[float]], n_lists: int) -> np.ndarray:
+        if self.method == FusionMethod.RRF or weights is None:
+            w = np.ones(n_lists)
+        else:
+            w = np.asarray(weights, dtype=np.float64)
+            if len(w) != n_lists:
+                raise ValueError(f"Expected {n_lists} fusion weights, got {len(w)}")
+        if self.method == FusionMethod.CONVEX:
+            return w / w.sum()
+        # Mean-one weights keep weighted RRF on the same scale as plain RRF
+        return w * n_lists / w.sum()
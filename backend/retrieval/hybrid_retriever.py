@@ -1,81 +1,227 @@
 """
 Hybrid Retriever — combines dense vector + BM25 lexical search
-with Reciprocal Rank Fusion (RRF).
+with weighted score fusion (RRF by default).
+Both legs run concurrently; a leg that misses its deadline is dropped
+and the result degrades to the other leg. Model loading and BM25 index
+loading happen in `warm_up`, outside any deadline.
+Fused results are cached per (query, top_k, fusion settings, store generation),
+so a repeated query skips both legs until the store is written to.
 """
-from typing import List, Dict
-from collections import defaultdict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Hashable, List, Optional, Tuple, Union
 
+from backend.utils.cache import LRUCache
 from backend.utils.datatypes import RetrievalResult
 from backend.retrieval.dense_retriever import DenseRetriever
 from backend.retrieval.bm25_retriever import BM25Retriever
+from backend.retrieval.fusion import ScoreFusion
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
 
 
 class HybridRetriever:
-    """Hybrid retrieval combining dense + BM25 with RRF fusion."""
+    """Hybrid retrieval combining dense + BM25 with weighted fusion."""
 
-    def __init__(self, dense_retriever: DenseRetriever, bm25_retriever: BM25Retriever):
+    def __init__(
+        self,
+        dense_retriever: DenseRetriever,
+        bm25_retriever: BM25Retriever,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
         self.dense = dense_retriever
         self.bm25 = bm25_retriever
-        self.rrf_k = CONFIG.retrieval.rrf_k
+        self.fusion = ScoreFusion()
+        self.weights = [CONFIG.retrieval.dense_weight, CONFIG.retrieval.bm25_weight]
+        self.dense_timeout = CONFIG.retrieval.dense_timeout
+        self.bm25_timeout = CONFIG.retrieval.bm25_timeout
+        self._cache = LRUCache(
+            maxsize=CONFIG.retrieval.result_cache_size,
+            ttl=CONFIG.retrieval.result_cache_ttl,
+        )
+        self._cache_generation: Optional[int] = None
+        self._cache_lock = threading.Lock()
+        self._warm = False
+        self._warm_lock = threading.Lock()
+        self._executor = executor
+        if self._executor is None and CONFIG.retrieval.parallel_retrieval:
+            self._executor = ThreadPoolExecutor(
+                max_workers=CONFIG.retrieval.retrieval_workers,
+                thread_name_prefix="hybrid-retrieval",
+            )
+
+    def warm_up(self):
+        """
+        Load the embedding model and the BM25 index. The leg deadlines are meant
+        for query work only, so this runs before the first deadline applies
+        (eagerly from the API lifespan and the evaluation script, otherwise on
+        the first retrieval).
+        """
+        with self._warm_lock:
+            if self._warm:
+                return
+            start = time.monotonic()
+            self.dense.embedder.warm_up()
+            self.bm25.ensure_index()
+            self._warm = True
+            logger.info(f"Hybrid retrieval: legs warmed up in {time.monotonic() - start:.2f}s")
 
     def retrieve(self, query: str, top_k: int = None) -> List[RetrievalResult]:
-        """Retrieve using both methods and fuse with RRF."""
+        """Retrieve using both methods and fuse the ranked lists."""
+        return self.retrieve_detailed(query, top_k)[0]
+
+    def retrieve_detailed(
+        self, query: str, top_k: int = None
+    ) -> Tuple[List[RetrievalResult], List[RetrievalResult], List[RetrievalResult]]:
+        """
+        `retrieve` that also returns the dense and BM25 lists the fusion was
+        computed from (for retrieval quality estimation). The leg lists are
+        shared with the cache and must be treated as read-only.
+        """
         top_k = top_k or CONFIG.retrieval.top_k
         fetch_k = top_k * 2  # Fetch more for fusion
 
+        key = self._cache_key(query, top_k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.info(f"Hybrid retrieval: cache hit for '{query[:50]}'")
+            fused, dense_results, bm25_results = cached
+            return self._copy(fused), dense_results, bm25_results
+
         # Parallel retrieval
-        dense_results = self.dense.retrieve(query, top_k=fetch_k)
-        bm25_results = self.bm25.retrieve(query, top_k=fetch_k)
+        (dense_results, bm25_results), degraded = self._run_legs(
+            [
+                ("dense", self.dense.retrieve, self.dense_timeout),
+                ("bm25", self.bm25.retrieve, self.bm25_timeout),
+            ],
+            query,
+            fetch_k,
+        )
 
         logger.info(
             f"Hybrid retrieval: {len(dense_results)} dense, {len(bm25_results)} BM25"
         )
 
-        # Reciprocal Rank Fusion
-        fused = self._reciprocal_rank_fusion(
-            [dense_results, bm25_results], top_k=top_k
+        fused = self.fusion.fuse(
+            [dense_results, bm25_results], top_k=top_k, weights=self.weights
+        )
+        logger.info(f"{self.fusion.method.value} fusion produced {len(fused)} results")
+
+        if not degraded:
+            self._cache.put(key, (self._copy(fused), dense_results, bm25_results))
+        return fused, dense_results, bm25_results
+
+    def retrieve_batch(
+        self, queries: List[str], top_k: int = None
+    ) -> List[List[RetrievalResult]]:
+        """
+        Retrieve for several queries at once: one embedding pass and one Chroma
+        query for the dense leg, one BM25 matrix pass, then per-query fusion.
+        """
+        top_k = top_k or CONFIG.retrieval.top_k
+        if not queries:
+            return []
+        fetch_k = top_k * 2
+
+        keys = [self._cache_key(query, top_k) for query in queries]
+        fused: List[Optional[List[RetrievalResult]]] = [self._cache.get(key) for key in keys]
+        fused = [None if hit is None else self._copy(hit[0]) for hit in fused]
+        missing = [i for i, hit in enumerate(fused) if hit is None]
+        if not missing:
+            logger.info(f"Hybrid batch retrieval: all {len(queries)} queries cached")
+            return fused
+
+        (dense_lists, bm25_lists), degraded = self._run_legs(
+            [
+                ("dense", self.dense.retrieve_batch, self.dense_timeout),
+                ("bm25", self.bm25.retrieve_batch, self.bm25_timeout),
+            ],
+            [queries[i] for i in missing],
+            fetch_k,
         )
+        # A degraded leg returns a single empty list
+        dense_lists = dense_lists or [[] for _ in missing]
+        bm25_lists = bm25_lists or [[] for _ in missing]
 
+        logger.info(
+            f"Hybrid batch retrieval for {len(missing)} queries "
+            f"({len(queries) - len(missing)} cached)"
+        )
+        for i, dense, bm25 in zip(missing, dense_lists, bm25_lists):
+            fused[i] = self.fusion.fuse([dense, bm25], top_k=top_k, weights=self.weights)
+            if not degraded:
+                self._cache.put(keys[i], (self._copy(fused[i]), dense, bm25))
         return fused
 
-    def _reciprocal_rank_fusion(
+    def cache_stats(self):
+        return self._cache.stats()
+
+    def _cache_key(self, query: str, top_k: int) -> Hashable:
+        """
+        Cache key for a fused result list. The store generation is part of it,
+        and the cache is emptied when the generation moves (any add or delete).
+        The generation is read under the lock so concurrent queries observe
+        it in order and never clear entries of a newer generation.
+        """
+        with self._cache_lock:
+            generation = self.dense.store.generation
+            if generation != self._cache_generation:
+                self._cache.clear()
+                self._cache_generation = generation
+        return (
+            query,
+            top_k,
+            self.fusion.method.value,
+            self.fusion.rrf_k,
+            self.fusion.normalization,
+            tuple(self.weights),
+            generation,
+        )
+
+    @staticmethod
+    def _copy(results: List[RetrievalResult]) -> List[RetrievalResult]:
+        """Callers re-tag and re-wrap results, so cached lists are never handed out directly."""
+        return [result.model_copy(deep=True) for result in results]
+
+    def _run_legs(
         self,
-        result_lists: List[List[RetrievalResult]],
+        legs: List[Tuple[str, Callable[..., list], float]],
+        query: Union[str, List[str]],
         top_k: int,
-    ) -> List[RetrievalResult]:
+    ) -> Tuple[List[list], bool]:
         """
-        Fuse multiple ranked lists using Reciprocal Rank Fusion.
-        RRF score = sum( 1 / (k + rank_i) ) for each result list.
+        Run retrieval legs concurrently, each against its own deadline.
+        A leg that times out or fails contributes an empty list (degraded result);
+        if every leg fails, the last error is raised.
+        Returns the per-leg results and whether any leg was degraded.
         """
-        rrf_scores: Dict[str, float] = defaultdict(float)
-        chunk_map: Dict[str, RetrievalResult] = {}
-        methods_map: Dict[str, List[str]] = defaultdict(list)
-
-        for result_list in result_lists:
-            for rank, result in enumerate(result_list):
-                chunk_id = result.chunk.id
-                rrf_scores[chunk_id] += 1.0 / (self.rrf_k + rank + 1)
-                methods_map[chunk_id].append(result.retrieval_method)
-
-                if chunk_id not in chunk_map:
-                    chunk_map[chunk_id] = result
-
-        # Sort by RRF score
-        sorted_ids = sorted(rrf_scores.keys(), key=lambda x: rrf_scores[x], reverse=True)
-
-        fused_results = []
-        for chunk_id in sorted_ids[:top_k]:
-            result = chunk_map[chunk_id]
-            methods = list(set(methods_map[chunk_id]))
-            fused_results.append(
-                RetrievalResult(
-                    chunk=result.chunk,
-                    score=rrf_scores[chunk_id],
-                    retrieval_method="+".join(methods),
-                )
-            )
+        if not self._warm:
+            self.warm_up()
+        if self._executor is None:
+            return [retrieve(query, top_k=top_k) for _, retrieve, _ in legs], False
+
+        start = time.monotonic()
+        futures = [
+            (name, self._executor.submit(retrieve, query, top_k=top_k), timeout)
+            for name, retrieve, timeout in legs
+        ]
+
+        results, failures, last_error = [], 0, None
+        for name, future, timeout in futures:
+            remaining = max(0.0, start + timeout - time.monotonic()) if timeout else None
+            try:
+                results.append(future.result(timeout=remaining))
+            except FutureTimeoutError as e:
+                # The worker keeps running in the background; its result is discarded
+                logger.warning(f"Hybrid retrieval: {name} leg missed its {timeout}s deadline, degrading")
+                results.append([])
+                failures, last_error = failures + 1, e
+            except Exception as e:
+                logger.error(f"Hybrid retrieval: {name} leg failed, degrading: {e}")
+                results.append([])
+                failures, last_error = failures + 1, e
 
-        logger.info(f"RRF fusion produced {len(fused_results)} results")
-        return fused_results
+        if failures == len(futures):
+            raise last_error
+        return results, failures > 0
@@ -0,0 +1,188 @@
+"""
+Retrieval Quality Estimator — decides whether first-pass retrieval is good
+enough to answer from, or whether the query should be expanded (HyDE).
+
+The estimate is computed from the per-leg result lists retrieval already
+produced, with no extra model or store calls:
+  * dense top-1 similarity  — how close the best chunk is to the query
+  * dense score gap         — top-1 vs the mean of the top-k (a clear winner)
+  * BM25 term coverage      — share of query terms found in the top BM25 hits
+Fused RRF scores are rank-based and carry no absolute quality information,
+which is why they are not used here.
+
+The normalization constants, weights and threshold are fitted on labelled
+queries by backend/evaluation/calibrate_quality.py, which writes them to
+retrieval.quality_calibration_path. Without that file the estimator falls
+back to uncalibrated defaults.
+"""
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from backend.retrieval.bm25_retriever import tokenize
+from backend.utils.config import CONFIG
+from backend.utils.datatypes import RetrievalResult
+from backend.utils.logger import logger
+
+# BM25 hits whose text is checked for query terms
+_COVERAGE_DEPTH = 3
+
+
+class QualityCalibration(BaseModel):
+    """Signal normalization, weights and threshold; defaults are uncalibrated guesses."""
+    # Dense cosine similarities mapped onto 0..1: unrelated text sits around
+    # the floor, close paraphrases near the ceiling
+    dense_floor: float = 0.25
+    dense_ceiling: float = 0.65
+    # A top-1 lead of this much over the top-k mean counts as a full-strength gap
+    gap_scale: float = 0.15
+    weights: Dict[str, float] = Field(
+        default_factory=lambda: {"dense_top1": 0.5, "dense_gap": 0.2, "bm25_coverage": 0.3}
+    )
+    threshold: Optional[float] = None  # None: retrieval.expansion_confidence_threshold
+    embedding_model: str = ""
+    # Evaluation of the fitted values (sample counts, expansion rate, recall)
+    report: Dict[str, float] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str = None) -> "QualityCalibration":
+        """Fitted calibration from disk, or the defaults if there is none (or it is for another model)."""
+        path = path or CONFIG.retrieval.quality_calibration_path
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                calibration = cls(**json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable retrieval-quality calibration {path}: {e}")
+            return cls()
+        if calibration.embedding_model and calibration.embedding_model != CONFIG.embedding.model_name:
+            logger.warning(
+                f"Retrieval-quality calibration {path} was fitted for "
+                f"{calibration.embedding_model}; using defaults"
+            )
+            return cls()
+        logger.info(f"Retrieval-quality calibration loaded from {path}")
+        return calibration
+
+    def save(self, path: str = None):
+        path = path or CONFIG.retrieval.quality_calibration_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.model_dump(), f, indent=2)
+
+
+class RetrievalQuality(BaseModel):
+    score: float  # 0..1 weighted combination of the signals
+    signals: Dict[str, float] = Field(default_factory=dict)
+    needs_expansion: bool = False
+
+
+def raw_signals(
+    query: str,
+    dense: List[RetrievalResult],
+    bm25: List[RetrievalResult],
+    tokenizer: Callable[[str], List[str]] = tokenize,
+) -> Dict[str, float]:
+    """Un-normalized signals: dense top-1 cosine, its lead over the mean, BM25 term coverage."""
+    signals = {"dense_top1": 0.0, "dense_gap": 0.0, "bm25_coverage": 0.0}
+
+    if dense:
+        scores = [r.score for r in dense]
+        signals["dense_top1"] = max(scores)
+        signals["dense_gap"] = max(scores) - sum(scores) / len(scores)
+
+    terms = set(tokenizer(query))
+    if terms and bm25:
+        found = set()
+        for result in bm25[:_COVERAGE_DEPTH]:
+            found.update(terms.intersection(tokenizer(result.chunk.text)))
+        signals["bm25_coverage"] = len(found) / len(terms)
+
+    return signals
+
+
+class RetrievalQualityEstimator:
+    """
+    Score first-pass retrieval and decide on expansion; keeps expansion-rate
+    counters. Subclass and override `signals` (or pass other weights) to plug
+    in a different estimate.
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        weights: Optional[Dict[str, float]] = None,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+        calibration: Optional[QualityCalibration] = None,
+    ):
+        self.calibration = calibration or QualityCalibration.load()
+        if threshold is None:
+            threshold = self.calibration.threshold
+        self.threshold = (
+            CONFIG.retrieval.expansion_confidence_threshold if threshold is None else threshold
+        )
+        self.weights = weights or self.calibration.weights
+        self.tokenizer = tokenizer
+        self._lock = threading.Lock()
+        self.assessed = 0
+        self.expansions = 0
+
+    def assess(
+        self,
+        query: str,
+        dense: List[RetrievalResult],
+        bm25: List[RetrievalResult],
+    ) -> RetrievalQuality:
+        """Estimate quality from the dense and BM25 result lists of one query."""
+        signals = self.signals(query, dense, bm25)
+        score = self.combine(signals)
+        needs_expansion = score < self.threshold and CONFIG.retrieval.hyde_enabled
+
+        with self._lock:
+            self.assessed += 1
+            self.expansions += needs_expansion
+        return RetrievalQuality(
+            score=round(score, 4), signals=signals, needs_expansion=needs_expansion
+        )
+
+    def signals(
+        self,
+        query: str,
+        dense: List[RetrievalResult],
+        bm25: List[RetrievalResult],
+    ) -> Dict[str, float]:
+        """Individual signals, each normalized to 0..1."""
+        return self.normalize(raw_signals(query, dense, bm25, self.tokenizer))
+
+    def normalize(self, raw: Dict[str, float]) -> Dict[str, float]:
+        """Map raw signals onto 0..1 with the calibrated constants."""
+        c = self.calibration
+        signals = {
+            "dense_top1": _clip((raw["dense_top1"] - c.dense_floor) / (c.dense_ceiling - c.dense_floor)),
+            "dense_gap": _clip(raw["dense_gap"] / c.gap_scale),
+            "bm25_coverage": raw["bm25_coverage"],
+        }
+        return {name: round(value, 4) for name, value in signals.items()}
+
+    def combine(self, signals: Dict[str, float]) -> float:
+        """Weighted mean of normalized signals."""
+        total = sum(self.weights.values()) or 1.0
+        return sum(w * signals.get(name, 0.0) for name, w in self.weights.items()) / total
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Expansion-rate metric for health/metrics endpoints."""
+        return {
+            "assessed": self.assessed,
+            "expansions": self.expansions,
+            "expansion_rate": round(self.expansions / self.assessed, 4) if self.assessed else None,
+            "threshold": self.threshold,
+            "calibrated": bool(self.calibration.report),
+        }
+
+
+def _clip(value: float) -> float:
+    return min(1.0, max(0.0, value))
@@ -2,34 +2,49 @@
 Query Expander — implements HyDE and MultiQuery retrieval strategies.
 Uses the LLM to generate alternative queries for improved recall.
 """
+import asyncio
 import json
-from typing import List
-from collections import defaultdict
-
-import requests
+import threading
+from concurrent.futures import Executor
+from typing import List, Optional
 
 from backend.utils.datatypes import RetrievalResult
 from backend.retrieval.hybrid_retriever import HybridRetriever
+from backend.retrieval.fusion import ScoreFusion
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
+from backend.utils.ollama_client import OllamaClient
+
+# Seconds between checks of a streamed call's cancel event
+_CANCEL_POLL_INTERVAL = 0.05
 
 
 class QueryExpander:
     """Expand queries using HyDE and MultiQuery strategies."""
 
-    def __init__(self, hybrid_retriever: HybridRetriever):
+    def __init__(
+        self,
+        hybrid_retriever: HybridRetriever,
+        ollama_client: Optional[OllamaClient] = None,
+    ):
         self.retriever = hybrid_retriever
-        self.ollama_url = CONFIG.ollama.base_url
+        self.ollama = ollama_client or OllamaClient()
         self.model = CONFIG.ollama.model
+        self.fusion = ScoreFusion()
 
-    def hyde_retrieve(self, query: str, top_k: int = None) -> List[RetrievalResult]:
+    def hyde_retrieve(
+        self, query: str, top_k: int = None, hypothetical: Optional[str] = None
+    ) -> List[RetrievalResult]:
         """
         HyDE: Generate a hypothetical answer, embed it, and search.
         This finds documents similar to what a good answer would look like.
+        Pass `hypothetical` when it was already generated (speculatively);
+        an empty string means generation failed and retrieval falls back to the query.
         """
         top_k = top_k or CONFIG.retrieval.top_k
 
-        hypothetical = self._generate_hypothetical_answer(query)
+        if hypothetical is None:
+            hypothetical = self.generate_hypothetical(query)
         if not hypothetical:
             logger.warning("HyDE: failed to generate hypothetical, falling back to direct")
             return self.retriever.retrieve(query, top_k=top_k)
@@ -43,6 +58,34 @@ class QueryExpander:
 
         return results
 
+    async def ahyde_retrieve(
+        self,
+        query: str,
+        top_k: int = None,
+        executor: Optional[Executor] = None,
+        hypothetical: Optional[str] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Async HyDE: the hypothetical answer is awaited from Ollama, and the
+        blocking retrieval runs on `executor` (the loop's default when None).
+        """
+        top_k = top_k or CONFIG.retrieval.top_k
+        loop = asyncio.get_running_loop()
+
+        if hypothetical is None:
+            hypothetical = await self.agenerate_hypothetical(query)
+        if not hypothetical:
+            logger.warning("HyDE: failed to generate hypothetical, falling back to direct")
+            return await loop.run_in_executor(executor, self.retriever.retrieve, query, top_k)
+
+        logger.info(f"HyDE: generated hypothetical answer ({len(hypothetical)} chars)")
+
+        results = await loop.run_in_executor(executor, self.retriever.retrieve, hypothetical, top_k)
+        for r in results:
+            r.retrieval_method = f"hyde+{r.retrieval_method}"
+
+        return results
+
     def multi_query_retrieve(
         self, query: str, top_k: int = None
     ) -> List[RetrievalResult]:
@@ -59,29 +102,42 @@ class QueryExpander:
 
         logger.info(f"MultiQuery: generated {len(alt_queries)} alternative queries")
 
-        # Retrieve for each query
-        all_results = [self.retriever.retrieve(query, top_k=top_k)]
-        for aq in alt_queries:
-            results = self.retriever.retrieve(aq, top_k=top_k)
-            all_results.append(results)
+        # Retrieve for the original and all alternatives in one batch
+        all_results = self.retriever.retrieve_batch([query] + alt_queries, top_k=top_k)
 
-        # Fuse all result lists using RRF
-        fused = self._fuse_results(all_results, top_k)
+        # Fuse all result lists (equal weights)
+        fused = self.fusion.fuse(all_results, top_k, merge_methods=False)
         for r in fused:
             r.retrieval_method = f"multiquery+{r.retrieval_method}"
 
         return fused
 
-    def _generate_hypothetical_answer(self, query: str) -> str:
-        """Use LLM to generate a hypothetical document passage that answers the query."""
-        prompt = (
+    def generate_hypothetical(
+        self, query: str, cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Use LLM to generate a hypothetical document passage that answers the query.
+        With a `cancel` event the passage is streamed, and setting the event stops
+        it early (closing the connection also aborts the generation in Ollama).
+        """
+        prompt = self._hypothetical_prompt(query)
+        if cancel is None:
+            return self._call_ollama(prompt, max_tokens=200)
+        return self._stream_ollama(prompt, max_tokens=200, cancel=cancel)
+
+    async def agenerate_hypothetical(self, query: str) -> str:
+        """Async `generate_hypothetical`; cancel it by cancelling the awaiting task."""
+        return await self._acall_ollama(self._hypothetical_prompt(query), max_tokens=200)
+
+    @staticmethod
+    def _hypothetical_prompt(query: str) -> str:
+        return (
             f"You are a medical knowledge assistant. Write a brief, factual passage "
             f"that would answer the following question about medications. "
             f"Write in the style of a drug information document.\n\n"
             f"Question: {query}\n\n"
             f"Passage:"
         )
-        return self._call_ollama(prompt, max_tokens=200)
 
     def _generate_alternative_queries(self, query: str, count: int = 3) -> List[str]:
         """Use LLM to generate alternative query formulations."""
@@ -112,47 +168,84 @@ class QueryExpander:
     def _call_ollama(self, prompt: str, max_tokens: int = 200) -> str:
         """Call Ollama for text generation."""
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": max_tokens,
-                    },
-                },
+            data = self.ollama.generate(
+                self.model,
+                prompt,
+                {"temperature": 0.3, "num_predict": max_tokens},
                 timeout=30,
             )
-            response.raise_for_status()
-            return response.json().get("response", "")
+            return data.get("response", "")
         except Exception as e:
             logger.error(f"Ollama call failed: {e}")
             return ""
 
-    def _fuse_results(
-        self, result_lists: List[List[RetrievalResult]], top_k: int
-    ) -> List[RetrievalResult]:
-        """Reciprocal Rank Fusion across multiple result lists."""
-        k = CONFIG.retrieval.rrf_k
-        scores = defaultdict(float)
-        chunk_map = {}
-
-        for result_list in result_lists:
-            for rank, result in enumerate(result_list):
-                cid = result.chunk.id
-                scores[cid] += 1.0 / (k + rank + 1)
-                if cid not in chunk_map:
-                    chunk_map[cid] = result
-
-        sorted_ids = sorted(scores.keys(), key=lambda x: scores[x], reverse=True)
-
-        return [
-            RetrievalResult(
-                chunk=chunk_map[cid].chunk,
-                score=scores[cid],
-                retrieval_method=chunk_map[cid].retrieval_method,
+    def _stream_ollama(
+        self, prompt: str, max_tokens: int, cancel: threading.Event
+    ) -> str:
+        """
+        Streamed `_call_ollama` that returns "" as soon as `cancel` is set. The
+        request runs on a helper thread, so a cancelled caller returns at once
+        even before Ollama sends its first token, and the streaming response is
+        closed right away rather than after its next line arrives.
+        """
+        parts: List[str] = []
+        state = {"response": None, "failed": False}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def fetch():
+            try:
+                response = self.ollama.generate_stream(
+                    self.model,
+                    prompt,
+                    {"temperature": 0.3, "num_predict": max_tokens},
+                    timeout=30,
+                )
+                with lock:
+                    state["response"] = response
+                with response:
+                    # Cancelled before the caller could see the response
+                    if cancel.is_set():
+                        return
+                    for line in response.iter_lines():
+                        if cancel.is_set():
+                            return
+                        if line:
+                            try:
+                                parts.append(json.loads(line).get("response", ""))
+                            except json.JSONDecodeError:
+                                continue
+            except Exception as e:
+                state["failed"] = True
+                if not cancel.is_set():
+                    logger.error(f"Ollama call failed: {e}")
+            finally:
+                done.set()
+
+        threading.Thread(target=fetch, name="ollama-stream", daemon=True).start()
+        while not done.wait(_CANCEL_POLL_INTERVAL):
+            if cancel.is_set():
+                with lock:
+                    response = state["response"]
+                if response is not None:
+                    # Aborts the generation in Ollama; the helper's read then fails quietly
+                    response.close()
+                logger.info("Ollama call cancelled")
+                return ""
+        if cancel.is_set() or state["failed"]:
+            return ""
+        return "".join(parts)
+
+    async def _acall_ollama(self, prompt: str, max_tokens: int = 200) -> str:
+        """Async `_call_ollama`."""
+        try:
+            data = await self.ollama.agenerate(
+                self.model,
+                prompt,
+                {"temperature": 0.3, "num_predict": max_tokens},
+                timeout=30,
             )
-            for cid in sorted_ids[:top_k]
-        ]
+            return data.get("response", "")
+        except Exception as e:
+            logger.error(f"Ollama call failed: {e}")
+            return ""
@@ -0,0 +1,93 @@
+"""
+In-memory caching utilities shared by the retrieval and generation layers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional time-to-live and hit/miss counters."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float = 0,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds; 0 means entries never expire
+        # Called (outside the lock) for entries dropped by capacity or expiry
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable, default: Any = None, record: bool = True) -> Any:
+        """
+        Return the cached value (refreshing its recency) or `default`.
+        `record=False` leaves the hit/miss counters to the caller.
+        """
+        expired = None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl and entry[0] < time.monotonic():
+                del self._data[key]
+                expired, entry = entry, None
+            if entry is not None:
+                self._data.move_to_end(key)
+            if record:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if expired is not None:
+            self._evicted([(key, expired[1])])
+        return default if entry is None else entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._evicted(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def _evicted(self, entries: List[Tuple[Hashable, Any]]):
+        if self.on_evict is not None:
+            for key, value in entries:
+                self.on_evict(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Size and hit/miss counters for health/metrics endpoints."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -16,6 +16,11 @@ class EmbeddingConfig(BaseModel):
     dimension: int = 384
     batch_size: int = 32
     device: str = "cpu"
+    query_cache_size: int = 1024  # 0 disables the query embedding cache
+    query_cache_ttl: float = 3600.0  # seconds; 0 means no expiry
+    cache_enabled: bool = True  # persistent embedding cache for ingestion
+    cache_dir: str = str(VECTOR_STORE_DIR / "embedding_cache")
+    cache_dtype: str = "float16"
 
 
 class ChunkingConfig(BaseModel):
@@ -23,6 +28,7 @@ class ChunkingConfig(BaseModel):
     chunk_size: int = 512
     chunk_overlap: int = 50
     semantic_threshold: float = 0.75
+    semantic_pooled_embeddings: bool = True  # reuse mean sentence embeddings as chunk embeddings
     parent_chunk_size: int = 1024
     child_chunk_size: int = 256
 
@@ -39,15 +45,50 @@ class OllamaConfig(BaseModel):
     temperature: float = 0.2
     top_p: float = 0.9
     max_tokens: int = 1024
+    context_token_budget: int = 1536  # tokens of retrieved context per RAG prompt
+    chars_per_token: float = 3.5  # token estimate for phi3's tokenizer on English text
+    pool_size: int = 10  # keep-alive connections shared by all Ollama calls
+    max_retries: int = 2  # connection errors and 502/503/504 only
+    retry_backoff: float = 0.5  # seconds; doubles per retry
+    connect_timeout: float = 3.0
+    request_timeout: float = 120.0  # default read timeout
 
 
 class RetrievalConfig(BaseModel):
     top_k: int = 5
     rrf_k: int = 60
     hyde_enabled: bool = True
+    speculative_hyde: bool = False  # generate the HyDE passage during first-pass retrieval (an LLM call per query)
+    expansion_confidence_threshold: float = 0.45  # expand when retrieval quality scores below this
+    # Fitted estimator constants + threshold (backend/evaluation/calibrate_quality.py)
+    quality_calibration_path: str = str(VECTOR_STORE_DIR / "retrieval_quality.json")
     multi_query_count: int = 3
     bm25_weight: float = 0.4
     dense_weight: float = 0.6
+    fusion_method: str = "weighted_rrf"  # rrf | weighted_rrf | convex
+    fusion_normalization: str = "minmax"  # minmax | zscore (convex only)
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    bm25_persist: bool = True
+    parallel_retrieval: bool = True
+    retrieval_workers: int = 8
+    dense_timeout: float = 5.0  # seconds; 0 disables the deadline
+    bm25_timeout: float = 5.0
+    result_cache_size: int = 512  # fused hybrid result lists; 0 disables the cache
+    result_cache_ttl: float = 0.0  # seconds; 0 means no expiry (generation still invalidates)
+    parent_context_enabled: bool = True  # swap child chunks for their parents before generation
+    parent_cache_size: int = 2048  # hot parent chunks kept in memory
+    query_workers: int = 4  # threads for blocking retrieval work on the async query path
+    answer_cache_size: int = 256  # cached final answers; 0 disables the answer cache
+    answer_cache_ttl: float = 3600.0  # seconds; 0 means no expiry
+    answer_cache_similarity: float = 0.95  # near-duplicate threshold; 0 disables the semantic tier
+
+
+class IngestionConfig(BaseModel):
+    workers: int = 0  # parser processes; 0 = one per CPU (at most 4), 1 = run in-process
+    max_pending_documents: int = 0  # documents in flight; 0 = 2 x workers
+    embed_batch_size: int = 256  # chunks per embed + ChromaDB write
+    extraction_mode: str = "auto"  # dict | text | auto (see ExtractionMode)
 
 
 class LangSmithConfig(BaseModel):
@@ -64,6 +105,7 @@ class AppConfig(BaseModel):
     chroma: ChromaConfig = ChromaConfig()
     ollama: OllamaConfig = OllamaConfig()
     retrieval: RetrievalConfig = RetrievalConfig()
+    ingestion: IngestionConfig = IngestionConfig()
     langsmith: LangSmithConfig = LangSmithConfig()
     documents_dir: str = str(DOCUMENTS_DIR)
     data_dir: str = str(DATA_DIR)
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, Any, List, Union
 from enum import Enum
 import uuid
 
+import numpy as np
+
 
 class ChunkingStrategy(str, Enum):
     RECURSIVE = "recursive"
@@ -12,6 +14,18 @@ class ChunkingStrategy(str, Enum):
     PARENT_CHILD = "parent_child"
 
 
+class FusionMethod(str, Enum):
+    RRF = "rrf"
+    WEIGHTED_RRF = "weighted_rrf"
+    CONVEX = "convex"
+
+
+class ExtractionMode(str, Enum):
+    DICT = "dict"  # per-span text + formatting (needed for heading inference)
+    TEXT = "text"  # plain text blocks only
+    AUTO = "auto"  # TEXT for strategies that ignore headings, DICT otherwise
+
+
 class DocumentPage(BaseModel):
     page_number: int
     text: str
@@ -23,13 +37,20 @@ class DocumentSection(BaseModel):
     content: str
     level: int = 1
     page_number: int = 0
+    document_name: str = ""
+    # Character span of `content` within its page's text (page.text[start_char:end_char])
+    start_char: int = 0
+    end_char: int = 0
 
 
 class DocumentChunk(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     text: str
     metadata: Dict[str, Any] = Field(default_factory=dict)
-    embedding: Optional[List[float]] = None
+    # Precomputed embedding (a float32 row from semantic chunking, or a list)
+    embedding: Optional[Union[np.ndarray, List[float]]] = None
     parent_id: Optional[str] = None
 
     @property
@@ -0,0 +1,205 @@
+"""
+Ollama Client — shared HTTP transport for all Ollama calls.
+One keep-alive session with a bounded connection pool serves generation,
+query expansion and model info, so a query reuses warm connections instead of
+opening a new TCP connection per call. Connection failures and transient 5xx
+responses are retried with exponential backoff.
+
+The a-prefixed methods are the asyncio equivalents (httpx), used by the async
+API query path so a slow generation does not hold a thread or the event loop.
+"""
+import asyncio
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from backend.utils.config import CONFIG
+from backend.utils.logger import logger
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Transient gateway / overload responses worth retrying
+_RETRY_STATUSES = (502, 503, 504)
+
+
+class OllamaClient:
+    """Pooled, retrying HTTP client for the Ollama REST API."""
+
+    def __init__(
+        self,
+        base_url: str = None,
+        pool_size: int = None,
+        max_retries: int = None,
+        backoff: float = None,
+    ):
+        self.base_url = (base_url or CONFIG.ollama.base_url).rstrip("/")
+        self.connect_timeout = CONFIG.ollama.connect_timeout
+        self.pool_size = pool_size or CONFIG.ollama.pool_size
+        self.max_retries = CONFIG.ollama.max_retries if max_retries is None else max_retries
+        self.backoff = CONFIG.ollama.retry_backoff if backoff is None else backoff
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            status=self.max_retries,
+            # Never resend a request the server may already be generating for
+            read=0,
+            backoff_factor=self.backoff,
+            status_forcelist=_RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """POST to an API path; raises for HTTP errors that survive the retries."""
+        response = self.session.post(
+            f"{self.base_url}{path}",
+            json=payload,
+            stream=stream,
+            timeout=self._timeout(timeout),
+        )
+        if not response.ok:
+            # A streamed response holds its pooled connection until closed
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Non-streaming /api/generate; returns the decoded response body."""
+        return self.post(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": False, "options": options},
+            timeout=timeout,
+        ).json()
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """Streaming /api/generate; the caller iterates (and closes) the response."""
+        return self.post(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": True, "options": options},
+            timeout=timeout,
+            stream=True,
+        )
+
+    def show(self, model: str, timeout: Optional[float] = 10) -> Dict[str, Any]:
+        return self.post("/api/show", {"name": model}, timeout=timeout).json()
+
+    def close(self):
+        self.session.close()
+        logger.info("Closed Ollama connection pool")
+
+    # --- asyncio transport ---
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                # Transport-level retries cover connection failures only
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+            )
+        return self._async_client
+
+    async def apost(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """
+        POST to an API path, retrying 502/503/504 with backoff. With stream=True
+        the body is not read and the caller must `await response.aclose()`.
+        """
+        request = self.async_client.build_request(
+            "POST", path, json=payload, timeout=self._async_timeout(timeout)
+        )
+        for attempt in range(self.max_retries + 1):
+            response = await self.async_client.send(request, stream=stream)
+            if response.status_code not in _RETRY_STATUSES or attempt == self.max_retries:
+                break
+            await response.aclose()
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return response
+
+    async def agenerate(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        response = await self.apost(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": False, "options": options},
+            timeout=timeout,
+        )
+        return response.json()
+
+    async def agenerate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """Streaming /api/generate; iterate `aiter_lines()` and close the response."""
+        return await self.apost(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": True, "options": options},
+            timeout=timeout,
+            stream=True,
+        )
+
+    async def ashow(self, model: str, timeout: Optional[float] = 10) -> Dict[str, Any]:
+        response = await self.apost("/api/show", {"name": model}, timeout=timeout)
+        return response.json()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            logger.info("Closed async Ollama connection pool")
+
+    def _timeout(self, read_timeout: Optional[float]) -> Timeout:
+        """(connect, read) timeout: fail fast when Ollama is down, wait long for generation."""
+        return (self.connect_timeout, read_timeout or CONFIG.ollama.request_timeout)
+
+    def _async_timeout(self, read_timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(
+            read_timeout or CONFIG.ollama.request_timeout, connect=self.connect_timeout
+        )
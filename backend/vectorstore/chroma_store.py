@@ -3,14 +3,23 @@ ChromaDB Vector Store — persistent vector database for document chunks.
 Stores embeddings with metadata (document name, page number, section title).
 """
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Union
 
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
 from backend.utils.datatypes import DocumentChunk, RetrievalResult
 from backend.utils.config import CONFIG
 from backend.utils.logger import logger
+from backend.vectorstore.parent_store import ParentStore
 
 
 class ChromaStore:
@@ -21,6 +30,18 @@ class ChromaStore:
         self.persist_directory = persist_directory or CONFIG.chroma.persist_directory
         self._client = None
         self._collection = None
+        self._generation_path = os.path.join(
+            self.persist_directory, f"{self.collection_name}.generation"
+        )
+        self._generation_lock_path = f"{self._generation_path}.lock"
+        # In-memory generation and the (inode, mtime, size) of the file it was read from
+        self._generation_value: Optional[int] = None
+        self._generation_stamp: Optional[tuple] = None
+        self._generation_lock = threading.RLock()
+        # Parent chunks live outside the vector index; they are fetched by id only
+        self.parents = ParentStore(
+            os.path.join(self.persist_directory, f"{self.collection_name}.parents.db")
+        )
 
     @property
     def client(self):
@@ -43,21 +64,83 @@ class ChromaStore:
             )
         return self._collection
 
+    @property
+    def generation(self) -> int:
+        """
+        Counter bumped on every write, so derived indexes can detect staleness.
+        Kept in memory: caches check it on every lookup, so the file is only
+        re-read when an os.stat shows another process has replaced it.
+
+        Invariant: the file is only ever written by `_bump_generation` as a
+        new file moved over the old one with os.replace, so every bump gives
+        it a new inode. The (inode, mtime, size) stamp depends on that: an
+        in-place rewrite of the same length within the filesystem's mtime
+        granularity would go unnoticed.
+        """
+        stamp = self._generation_file_stamp()
+        with self._generation_lock:
+            if self._generation_value is None or stamp != self._generation_stamp:
+                self._generation_value = self._read_generation()
+                self._generation_stamp = stamp
+            return self._generation_value
+
+    def _bump_generation(self):
+        """
+        Persist generation + 1 (shared by every process using this store). The
+        read-increment-replace runs under an flock, so concurrent writers in
+        different processes each get their own generation.
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        with self._generation_lock, self._generation_file_lock():
+            # Re-read under the lock: another process may have bumped it since
+            generation = self._read_generation() + 1
+            # Always a fresh file swapped in (new inode); `generation` relies on it
+            tmp_path = f"{self._generation_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(generation))
+            os.replace(tmp_path, self._generation_path)
+            self._generation_value = generation
+            self._generation_stamp = self._generation_file_stamp()
+
+    @contextmanager
+    def _generation_file_lock(self):
+        """Cross-process exclusive lock serializing generation bumps."""
+        with open(self._generation_lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self._generation_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _generation_file_stamp(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self._generation_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
     def add_documents(
-        self, chunks: List[DocumentChunk], embeddings: List[List[float]]
+        self,
+        chunks: List[DocumentChunk],
+        embeddings: Union[np.ndarray, List[List[float]]],
     ):
-        """Add document chunks with embeddings to the collection."""
-        if not chunks or not embeddings:
+        """Add document chunks with embeddings (an (n, dim) array or nested lists) to the collection."""
+        if not chunks or len(embeddings) == 0:
             return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
 
         ids = [chunk.id for chunk in chunks]
         texts = [chunk.text for chunk in chunks]
-        metadatas = []
-        for chunk in chunks:
-            meta = {k: v for k, v in chunk.metadata.items() if isinstance(v, (str, int, float, bool))}
-            if chunk.parent_id:
-                meta["parent_id"] = chunk.parent_id
-            metadatas.append(meta)
+        metadatas = [self.stored_metadata(chunk) for chunk in chunks]
 
         batch_size = 100
         for i in range(0, len(ids), batch_size):
@@ -65,23 +148,42 @@ class ChromaStore:
             self.collection.add(
                 ids=ids[i:end],
                 documents=texts[i:end],
-                embeddings=embeddings[i:end],
+                # Only the current batch is materialized as Python floats
+                embeddings=embeddings[i:end].tolist(),
                 metadatas=metadatas[i:end],
             )
 
+        self._bump_generation()
         logger.info(f"Added {len(ids)} chunks to ChromaDB")
 
+    @staticmethod
+    def stored_metadata(chunk: DocumentChunk) -> Dict[str, Any]:
+        """The metadata a chunk is stored with: scalar values only, plus its parent id."""
+        meta = {k: v for k, v in chunk.metadata.items() if isinstance(v, (str, int, float, bool))}
+        if chunk.parent_id:
+            meta["parent_id"] = chunk.parent_id
+        return meta
+
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = None,
         where: Optional[Dict[str, Any]] = None,
     ) -> List[RetrievalResult]:
         """Search for similar documents by embedding."""
+        return self.search_batch([query_embedding], top_k=top_k, where=where)[0]
+
+    def search_batch(
+        self,
+        query_embeddings: Union[np.ndarray, List[List[float]]],
+        top_k: int = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[RetrievalResult]]:
+        """Search several query embeddings in a single collection query."""
         top_k = top_k or CONFIG.retrieval.top_k
 
         kwargs = {
-            "query_embeddings": [query_embedding],
+            "query_embeddings": np.asarray(query_embeddings, dtype=np.float32).tolist(),
             "n_results": top_k,
             "include": ["documents", "metadatas", "distances"],
         }
@@ -90,22 +192,25 @@ class ChromaStore:
 
         results = self.collection.query(**kwargs)
 
-        retrieval_results = []
-        if results and results["ids"] and results["ids"][0]:
-            for i in range(len(results["ids"][0])):
-                chunk = DocumentChunk(
-                    id=results["ids"][0][i],
-                    text=results["documents"][0][i],
-                    metadata=results["metadatas"][0][i] if results["metadatas"] else {},
-                )
-                # ChromaDB returns distances; for cosine, distance = 1 - similarity
-                distance = results["distances"][0][i] if results["distances"] else 0
-                score = 1.0 - distance  # Convert to similarity
-                retrieval_results.append(
-                    RetrievalResult(chunk=chunk, score=score, retrieval_method="dense")
-                )
+        batch_results = []
+        for q in range(len(query_embeddings)):
+            retrieval_results = []
+            if results and results["ids"] and q < len(results["ids"]):
+                for i in range(len(results["ids"][q])):
+                    chunk = DocumentChunk(
+                        id=results["ids"][q][i],
+                        text=results["documents"][q][i],
+                        metadata=results["metadatas"][q][i] if results["metadatas"] else {},
+                    )
+                    # ChromaDB returns distances; for cosine, distance = 1 - similarity
+                    distance = results["distances"][q][i] if results["distances"] else 0
+                    score = 1.0 - distance  # Convert to similarity
+                    retrieval_results.append(
+                        RetrievalResult(chunk=chunk, score=score, retrieval_method="dense")
+                    )
+            batch_results.append(retrieval_results)
 
-        return retrieval_results
+        return batch_results
 
     def get_all_documents(self) -> List[str]:
         """Get all unique document texts (for BM25 indexing)."""
@@ -137,22 +242,69 @@ class ChromaStore:
             )
         return None
 
+    def get_chunks_by_ids(self, chunk_ids: List[str]) -> List[DocumentChunk]:
+        """Retrieve several chunks in one round trip, preserving the requested order."""
+        if not chunk_ids:
+            return []
+        result = self.collection.get(ids=list(chunk_ids), include=["documents", "metadatas"])
+        by_id = {}
+        for i in range(len(result["ids"])):
+            by_id[result["ids"][i]] = DocumentChunk(
+                id=result["ids"][i],
+                text=result["documents"][i],
+                metadata=result["metadatas"][i] if result["metadatas"] else {},
+            )
+        return [by_id[cid] for cid in chunk_ids if cid in by_id]
+
+    def add_parent_chunks(self, chunks: List[DocumentChunk]):
+        """Store parent chunks (text + metadata only, no embeddings)."""
+        if not chunks:
+            return
+        self.parents.add(chunks)
+        self._bump_generation()
+
     def get_parent_chunk(self, parent_id: str) -> Optional[DocumentChunk]:
         """Retrieve the parent chunk for context expansion."""
-        return self.get_chunk_by_id(parent_id)
+        chunks = self.get_parent_chunks([parent_id])
+        return chunks[0] if chunks else None
+
+    def get_parent_chunks(self, parent_ids: List[str]) -> List[DocumentChunk]:
+        """Retrieve several parent chunks in one lookup, preserving the requested order."""
+        found = {chunk.id: chunk for chunk in self.parents.get_many(parent_ids)}
+        missing = [pid for pid in dict.fromkeys(parent_ids) if pid not in found]
+        if missing:
+            # Collections ingested before the parent store kept parents in ChromaDB
+            found.update({chunk.id: chunk for chunk in self.get_chunks_by_ids(missing)})
+        return [found[pid] for pid in parent_ids if pid in found]
 
     def count(self) -> int:
         """Return the number of documents in the collection."""
         return self.collection.count()
 
+    def delete_chunks(self, chunk_ids: List[str]):
+        """Delete chunks by id (e.g. those of a changed or removed document)."""
+        if not chunk_ids:
+            return
+        batch_size = 500
+        for i in range(0, len(chunk_ids), batch_size):
+            self.collection.delete(ids=list(chunk_ids[i:i + batch_size]))
+        self.parents.delete(chunk_ids)
+        self._bump_generation()
+        logger.info(f"Deleted {len(chunk_ids)} chunks from ChromaDB")
+
     def delete_collection(self):
         """Delete the entire collection."""
         try:
             self.client.delete_collection(self.collection_name)
-            self._collection = None
             logger.info(f"Deleted collection '{self.collection_name}'")
         except Exception as e:
+            # e.g. the collection does not exist yet (first rebuild)
             logger.error(f"Failed to delete collection: {e}")
+        finally:
+            # Parents and derived caches must be reset either way
+            self._collection = None
+            self.parents.clear()
+            self._bump_generation()
 
     def list_documents(self) -> List[str]:
         """Get list of unique document names in the store."""
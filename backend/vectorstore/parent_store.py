@@ -0,0 +1,89 @@
+"""
+Parent Store — lightweight SQLite document store for parent chunks.
+Parents are only ever fetched by id for context expansion, so they are kept
+out of ChromaDB: they are never embedded and never show up in dense search.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+from backend.utils.datatypes import DocumentChunk
+from backend.utils.logger import logger
+
+# SQLite's default limit on host parameters per statement is 999
+_MAX_PARAMS = 900
+
+
+class ParentStore:
+    """Key-value store of parent chunks (id -> text + metadata) backed by SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Shared by the API's worker threads; access is serialized by self._lock
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS parents ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def add(self, chunks: List[DocumentChunk]):
+        """Insert or replace parent chunks."""
+        if not chunks:
+            return
+        rows = [(chunk.id, chunk.text, json.dumps(chunk.metadata)) for chunk in chunks]
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+        logger.info(f"Stored {len(chunks)} parent chunks")
+
+    def get(self, parent_id: str) -> Optional[DocumentChunk]:
+        chunks = self.get_many([parent_id])
+        return chunks[0] if chunks else None
+
+    def get_many(self, parent_ids: List[str]) -> List[DocumentChunk]:
+        """Fetch parents by id, preserving the requested order (missing ids are skipped)."""
+        if not parent_ids:
+            return []
+        ids = list(dict.fromkeys(parent_ids))
+        by_id = {}
+        with self._lock:
+            for i in range(0, len(ids), _MAX_PARAMS):
+                batch = ids[i:i + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, text, metadata in self.conn.execute(
+                    f"SELECT id, text, metadata FROM parents WHERE id IN ({placeholders})", batch
+                ):
+                    by_id[chunk_id] = DocumentChunk(id=chunk_id, text=text, metadata=json.loads(metadata))
+        return [by_id[pid] for pid in parent_ids if pid in by_id]
+
+    def delete(self, parent_ids: List[str]):
+        if not parent_ids:
+            return
+        ids = list(parent_ids)
+        with self._lock:
+            for i in range(0, len(ids), _MAX_PARAMS):
+                batch = ids[i:i + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                self.conn.execute(f"DELETE FROM parents WHERE id IN ({placeholders})", batch)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM parents")
+            self.conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
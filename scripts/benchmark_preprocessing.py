@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+benchmark_preprocessing.py
+
+Measure per-page heading detection cost on the drug corpus: the previous
+line-by-span substring scan (O(lines x spans) per page) versus the offset-based
+single pass now used by TextPreprocessor. Also reports how often the two
+disagree (the substring scan can match a heading span on an unrelated line).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensure the backend module can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.ingestion.pdf_loader import PDFLoader
+from backend.preprocessing.preprocessor import TextPreprocessor
+
+
+def legacy_apply_formatting(text: str, raw_text: str, spans: np.ndarray) -> str:
+    """The previous algorithm: every line is substring-tested against every span."""
+    if spans is None or not len(spans):
+        return text
+
+    span_texts = [raw_text[s:e].strip() for s, e in zip(spans["start"], spans["end"])]
+    sizes = sorted(
+        {round(float(span["size"]), 1) for span, t in zip(spans, span_texts) if span["bold"] and t},
+        reverse=True,
+    )
+    heading_sizes = {str(size): i + 1 for i, size in enumerate(sizes[:3])}
+
+    formatted_lines = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            formatted_lines.append("")
+            continue
+        level = 0
+        for span, span_text in zip(spans, span_texts):
+            if span_text and span_text in stripped and span["bold"]:
+                size_key = str(round(float(span["size"]), 1))
+                if size_key in heading_sizes:
+                    level = heading_sizes[size_key]
+                    break
+        formatted_lines.append(f"{'#' * level} {stripped}" if level else stripped)
+    return "\n".join(formatted_lines)
+
+
+def time_call(fn, repeat: int) -> float:
+    """Best-of-`repeat` wall time of fn() in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heading detection per PDF page.")
+    parser.add_argument(
+        "--docs-dir",
+        default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "documents", "drugs"),
+        help="Directory of PDFs to benchmark",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N PDFs")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per page")
+    args = parser.parse_args()
+
+    loader = PDFLoader(extraction_mode="dict")  # heading detection needs spans
+    preprocessor = TextPreprocessor()
+    pdf_files = loader.list_pdfs(args.docs_dir)
+    if args.limit:
+        pdf_files = pdf_files[: args.limit]
+    if not pdf_files:
+        print(f"No PDFs found in {args.docs_dir}")
+        sys.exit(1)
+
+    legacy_times, new_times, span_counts = [], [], []
+    differing_pages = 0
+
+    for file_path in pdf_files:
+        for page in loader.iter_pages(file_path):
+            spans = page.metadata.get("formatting_spans")
+            cleaned = preprocessor._clean_text(page.text)
+
+            legacy = legacy_apply_formatting(cleaned, page.text, spans)
+            current = preprocessor._apply_formatting(cleaned, page.text, spans)
+            differing_pages += legacy != current
+
+            legacy_times.append(time_call(
+                lambda: legacy_apply_formatting(cleaned, page.text, spans), args.repeat
+            ))
+            new_times.append(time_call(
+                lambda: preprocessor._apply_formatting(cleaned, page.text, spans), args.repeat
+            ))
+            span_counts.append(0 if spans is None else len(spans))
+
+    legacy_us = np.array(legacy_times) * 1e6
+    new_us = np.array(new_times) * 1e6
+    spans = np.array(span_counts)
+
+    print(f"PDFs: {len(pdf_files)}  pages: {len(spans)}  spans/page: "
+          f"mean {spans.mean():.0f}, max {spans.max()}")
+    print(f"{'algorithm':<22}{'mean us/page':>14}{'p95 us/page':>14}{'total ms':>12}")
+    for name, values in (("substring scan (old)", legacy_us), ("offset pass (new)", new_us)):
+        print(f"{name:<22}{values.mean():>14.1f}{np.percentile(values, 95):>14.1f}"
+              f"{values.sum() / 1e3:>12.1f}")
+    print(f"speedup: {legacy_us.sum() / max(new_us.sum(), 1e-9):.1f}x")
+
+    # The worst pages are the dense ones; show how cost scales with span count
+    dense = spans >= np.percentile(spans, 90)
+    if dense.any():
+        print(f"densest 10% of pages ({int(dense.sum())}): old {legacy_us[dense].mean():.1f} us, "
+              f"new {new_us[dense].mean():.1f} us")
+    print(f"pages where output differs: {differing_pages}")
+
+
+if __name__ == "__main__":
+    main()